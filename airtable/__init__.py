@@ -1 +1 @@
-from .airtable import Airtable  # noqa
+from .airtable import Airtable, BatchError  # noqa
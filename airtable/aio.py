@@ -0,0 +1,452 @@
+"""
+
+AsyncAirtable Class Instance
+****************************
+
+:any:`AsyncAirtable` has the same methods as :any:`Airtable`, as coroutines,
+for use from an asyncio event loop. Requests share a pooled ``aiohttp``
+session, so many tables can be read and written concurrently without a
+thread per request.
+
+Requires ``aiohttp``.
+
+>>> async with AsyncAirtable('base_key', 'table_name', api_key) as airtable:
+...     records = await airtable.get_all(view='ViewName')
+
+Record/Page Iterator:
+
+>>> async for page in airtable.get_iter(view='ViewName', sort='COLUMN_A'):
+...     for record in page:
+...         value = record['fields']['COLUMN_A']
+
+Several tables at once:
+
+>>> people, orders = await asyncio.gather(
+...     people_table.get_all(), orders_table.get_all()
+... )
+
+Requests go through the same per-base rate limiter as :any:`Airtable`
+(see :any:`get_rate_limiter`) and are retried according to a
+:any:`RetryPolicy`. Batch methods send their chunks concurrently, throttled
+by the rate limiter.
+
+To share one connection pool between tables, pass the same
+``aiohttp.ClientSession`` as ``session``. Sessions created by the instance
+are closed by :any:`AsyncAirtable.close` or when leaving ``async with``.
+
+"""  #
+
+import asyncio
+import posixpath
+from collections import namedtuple
+from urllib.parse import quote
+
+import aiohttp
+
+from .airtable import Airtable, BatchError, BatchFailure
+from .params import AirtableParams
+from .ratelimit import get_rate_limiter
+from .retry import RetryPolicy
+
+_ResponseInfo = namedtuple("_ResponseInfo", ["status_code", "headers"])
+
+
+class AsyncAirtable(object):
+
+    VERSION = Airtable.VERSION
+    API_BASE_URL = Airtable.API_BASE_URL
+    API_LIMIT = Airtable.API_LIMIT
+    API_URL = Airtable.API_URL
+    MAX_RECORDS_PER_REQUEST = Airtable.MAX_RECORDS_PER_REQUEST
+
+    # Query building does no I/O and is shared with the sync client
+    _process_params = Airtable._process_params
+    _chunk = Airtable._chunk
+    _build_batch_record_objects = Airtable._build_batch_record_objects
+    record_url = Airtable.record_url
+
+    def __init__(
+        self,
+        base_key,
+        table_name,
+        api_key,
+        timeout=None,
+        rate_limiter=None,
+        retry=None,
+        session=None,
+        connection_limit=100,
+    ):
+        """
+        Instantiates a new AsyncAirtable instance
+
+        >>> table = AsyncAirtable('basekey', 'tablename', api_key)
+
+        Args:
+            base_key(``str``): Airtable base identifier
+            table_name(``str``): Airtable table name. Value will be url encoded, so
+                use value as shown in Airtable.
+            api_key (``str``): API key.
+
+        Keyword Args:
+            timeout (``int``, ``Tuple[int, int]``, optional): Total timeout in
+                seconds, or a ``(connect, read)`` tuple.
+            rate_limiter (``TokenBucket``, optional): Limiter consulted before
+                each request. Defaults to the limiter shared by all tables of
+                ``base_key``. See :any:`get_rate_limiter`.
+            retry (``RetryPolicy``, optional): Retry policy.
+                Defaults to ``RetryPolicy()``.
+            session (``aiohttp.ClientSession``, optional): Session to send
+                requests with. If omitted, one is created on first use.
+            connection_limit (``int``, optional): Size of the connection pool
+                of the session created by this instance. Default is 100.
+
+        """
+        self.base_key = base_key
+        self.table_name = table_name
+        url_safe_table_name = quote(table_name, safe="")
+        self.url_table = posixpath.join(self.API_URL, base_key, url_safe_table_name)
+        if isinstance(timeout, tuple):
+            timeout = aiohttp.ClientTimeout(
+                sock_connect=timeout[0], sock_read=timeout[1]
+            )
+        elif timeout is not None:
+            timeout = aiohttp.ClientTimeout(total=timeout)
+        self.timeout = timeout
+        self._request_options = {} if timeout is None else {"timeout": timeout}
+        if rate_limiter is None:
+            rate_limiter = get_rate_limiter(base_key, rate=1.0 / self.API_LIMIT)
+        self.rate_limiter = rate_limiter
+        if retry is None:
+            retry = RetryPolicy()
+        self.retry = retry
+        self._headers = {"Authorization": "Bearer {}".format(api_key)}
+        self._session = session
+        self._owns_session = session is None
+        self.connection_limit = connection_limit
+
+    @property
+    def session(self):
+        """``aiohttp.ClientSession`` used for requests, created on first use"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.connection_limit)
+            self._session = aiohttp.ClientSession(connector=connector)
+            self._owns_session = True
+        return self._session
+
+    async def close(self):
+        """Closes the session if it was created by this instance"""
+        if self._owns_session and self._session is not None:
+            await self._session.close()
+        self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, tb):
+        await self.close()
+
+    @staticmethod
+    def _encode_params(params):
+        """Flattens processed params into the pairs expected by aiohttp"""
+        if not params:
+            return None
+        encoded = []
+        for name, value in params.items():
+            values = value if isinstance(value, (list, tuple)) else [value]
+            for item in values:
+                if item is None:
+                    continue
+                encoded.append((name, str(item)))
+        return encoded
+
+    async def _process_response(self, response):
+        try:
+            response.raise_for_status()
+        except aiohttp.ClientResponseError as exc:
+            # Attempt to get Error message from response, Issue #16
+            try:
+                error_dict = await response.json(content_type=None)
+            except ValueError:
+                pass
+            else:
+                if isinstance(error_dict, dict) and "error" in error_dict:
+                    exc.message = "{} [Error: {}]".format(
+                        exc.message, error_dict["error"]
+                    )
+            raise exc
+        else:
+            return await response.json(content_type=None)
+
+    async def _acquire(self):
+        wait = self.rate_limiter.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    async def _request(self, method, url, params=None, json_data=None):
+        attempt = 0
+        while True:
+            await self._acquire()
+            try:
+                async with self.session.request(
+                    method,
+                    url,
+                    params=self._encode_params(params),
+                    json=json_data,
+                    headers=self._headers,
+                    **self._request_options
+                ) as response:
+                    info = _ResponseInfo(response.status, response.headers)
+                    if self.retry.adaptive:
+                        if response.status == 429:
+                            self.rate_limiter.decrease()
+                        elif response.status < 400:
+                            self.rate_limiter.increase()
+                    if not self.retry.is_retryable(method, attempt, info):
+                        return await self._process_response(response)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if not self.retry.is_retryable(method, attempt):
+                    raise
+                info = None
+            await asyncio.sleep(self.retry.get_backoff(attempt, info))
+            attempt += 1
+
+    async def _get(self, url, **params):
+        processed_params = self._process_params(params)
+        return await self._request("get", url, params=processed_params)
+
+    async def _post(self, url, json_data):
+        return await self._request("post", url, json_data=json_data)
+
+    async def _put(self, url, json_data):
+        return await self._request("put", url, json_data=json_data)
+
+    async def _patch(self, url, json_data):
+        return await self._request("patch", url, json_data=json_data)
+
+    async def _delete(self, url):
+        return await self._request("delete", url)
+
+    async def _delete_batch(self, record_ids):
+        if len(record_ids) == 1:
+            return await self.delete(record_ids[0])
+
+        return await self._request(
+            "delete", self.url_table, params={"records": record_ids}
+        )
+
+    async def get(self, record_id):
+        """
+        Retrieves a record by its id. See :any:`Airtable.get`
+
+        >>> record = await airtable.get('recwPQIfs4wKPyc9D')
+        """
+        record_url = self.record_url(record_id)
+        return await self._get(record_url)
+
+    async def get_iter(self, **options):
+        """
+        Record Retriever Async Iterator. See :any:`Airtable.get_iter`
+
+        >>> async for page in airtable.get_iter():
+        ...     for record in page:
+        ...         print(record)
+        [{'fields': ... }, ...]
+        """
+        offset = options.pop("offset", None)
+        while True:
+            try:
+                data = await self._get(self.url_table, offset=offset, **options)
+            except aiohttp.ClientError as exc:
+                exc.offset = offset
+                raise
+            yield data.get("records", [])
+            offset = data.get("offset")
+            if not offset:
+                break
+
+    async def get_all(self, **options):
+        """
+        Retrieves all records repetitively and returns a single list.
+        See :any:`Airtable.get_all`
+
+        >>> await airtable.get_all(view='MyView', fields=['ColA', '-ColB'])
+        [{'fields': ... }, ...]
+        """
+        all_records = []
+        try:
+            async for records in self.get_iter(**options):
+                all_records.extend(records)
+        except aiohttp.ClientError as exc:
+            exc.records = all_records
+            raise
+        return all_records
+
+    async def match(self, field_name, field_value, **options):
+        """
+        Returns first match found in :any:`get_all`. See :any:`Airtable.match`
+
+        >>> await airtable.match('Name', 'John')
+        {'fields': {'Name': 'John'} }
+        """
+        from_name_and_value = AirtableParams.FormulaParam.from_name_and_value
+        options["formula"] = from_name_and_value(field_name, field_value)
+        for record in await self.get_all(**options):
+            return record
+        else:
+            return {}
+
+    async def search(self, field_name, field_value, record=None, **options):
+        """
+        Returns all matching records found in :any:`get_all`.
+        See :any:`Airtable.search`
+
+        >>> await airtable.search('Gender', 'Male')
+        [{'fields': {'Name': 'John', 'Gender': 'Male'}, ... ]
+        """
+        from_name_and_value = AirtableParams.FormulaParam.from_name_and_value
+        options["formula"] = from_name_and_value(field_name, field_value)
+        return await self.get_all(**options)
+
+    async def insert(self, fields, typecast=False):
+        """
+        Inserts a record. See :any:`Airtable.insert`
+
+        >>> await airtable.insert({'Name': 'John'})
+        """
+        return await self._post(
+            self.url_table, json_data={"fields": fields, "typecast": typecast}
+        )
+
+    async def _gather_chunks(self, send, items):
+        """
+        Sends chunks of ``items`` concurrently with ``send`` and returns the
+        records in input order. Failures are reported together in a
+        :any:`BatchError` once every chunk was attempted.
+        """
+        chunks = list(self._chunk(items, self.MAX_RECORDS_PER_REQUEST))
+        results = await asyncio.gather(
+            *(send(chunk) for chunk in chunks), return_exceptions=True
+        )
+        records, failures = [], []
+        start = 0
+        for chunk, result in zip(chunks, results):
+            if isinstance(result, Exception):
+                records += [None] * len(chunk)
+                failures.append(BatchFailure(start, chunk, result))
+            else:
+                records += result
+            start += len(chunk)
+        if failures:
+            raise BatchError(records, failures)
+        return records
+
+    async def batch_insert(self, records, typecast=False):
+        """
+        Breaks records into chunks of 10 and inserts them concurrently.
+        Results are returned in input order. If some chunks fail,
+        :any:`BatchError` is raised. See :any:`Airtable.batch_insert`
+
+        >>> await airtable.batch_insert([{'Name': 'John'}, {'Name': 'Marc'}])
+        """
+
+        async def send(chunk):
+            new_records = self._build_batch_record_objects(chunk)
+            response = await self._post(
+                self.url_table, json_data={"records": new_records, "typecast": typecast}
+            )
+            return response["records"]
+
+        return await self._gather_chunks(send, records)
+
+    async def update(self, record_id, fields, typecast=False):
+        """
+        Updates a record by its record id. See :any:`Airtable.update`
+
+        >>> await airtable.update(record['id'], {'Status': 'Fired'})
+        """
+        record_url = self.record_url(record_id)
+        return await self._patch(
+            record_url, json_data={"fields": fields, "typecast": typecast}
+        )
+
+    async def batch_update(self, records, typecast=False):
+        """
+        Updates records by their record id's in concurrent batches of 10.
+        See :any:`Airtable.batch_update`
+        """
+
+        async def send(chunk):
+            chunk_records = [{"id": x["id"], "fields": x["fields"]} for x in chunk]
+            response = await self._patch(
+                self.url_table,
+                json_data={"records": chunk_records, "typecast": typecast},
+            )
+            return response["records"]
+
+        return await self._gather_chunks(send, records)
+
+    async def update_by_field(
+        self, field_name, field_value, fields, typecast=False, **options
+    ):
+        """
+        Updates the first record to match field name and value.
+        See :any:`Airtable.update_by_field`
+        """
+        record = await self.match(field_name, field_value, **options)
+        if not record:
+            return {}
+        return await self.update(record["id"], fields, typecast)
+
+    async def replace(self, record_id, fields, typecast=False):
+        """
+        Replaces a record by its record id. See :any:`Airtable.replace`
+        """
+        record_url = self.record_url(record_id)
+        return await self._put(
+            record_url, json_data={"fields": fields, "typecast": typecast}
+        )
+
+    async def replace_by_field(
+        self, field_name, field_value, fields, typecast=False, **options
+    ):
+        """
+        Replaces the first record to match field name and value.
+        See :any:`Airtable.replace_by_field`
+        """
+        record = await self.match(field_name, field_value, **options)
+        if not record:
+            return {}
+        return await self.replace(record["id"], fields, typecast)
+
+    async def delete(self, record_id):
+        """
+        Deletes a record by its id. See :any:`Airtable.delete`
+
+        >>> await airtable.delete('recwPQIfs4wKPyc9D')
+        """
+        record_url = self.record_url(record_id)
+        return await self._delete(record_url)
+
+    async def delete_by_field(self, field_name, field_value, **options):
+        """
+        Deletes first record to match provided ``field_name`` and
+        ``field_value``. See :any:`Airtable.delete_by_field`
+        """
+        record = await self.match(field_name, field_value, **options)
+        record_url = self.record_url(record["id"])
+        return await self._delete(record_url)
+
+    async def batch_delete(self, record_ids):
+        """
+        Breaks records into batches of 10 and deletes them concurrently.
+        See :any:`Airtable.batch_delete`
+        """
+
+        async def send(chunk):
+            response = await self._delete_batch(chunk)
+            return response["records"] if len(chunk) > 1 else [response]
+
+        return await self._gather_chunks(send, record_ids)
+
+    def __repr__(self):
+        return "<AsyncAirtable table:{}>".format(self.table_name)
@@ -1,11 +1,21 @@
 from .airtable import Airtable
+from .params import AirtableParams
+from .schema import TableSchema, WriteFailure
 import pandas as pd
+import requests
 import os
 import numpy as np
 import boto3
 import traceback
 import tempfile
 import datetime
+import json
+import posixpath
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
 
 global context_table
 context_table = None
@@ -18,35 +28,206 @@ class PandasAirtable(Airtable):
 
     For details on parent: https://github.com/gtalarico/airtable-python-wrapper
     '''
+
+    # subtracted from the local clock when taking a refresh watermark, to
+    # cover clock skew with the Airtable servers
+    REFRESH_CLOCK_SKEW = datetime.timedelta(seconds=60)
     
-    def __init__(self, primary_key=None, *args, **kwargs):
-        
+    def __init__(self, primary_key=None, *args, index_record_ids=True,
+                 snapshot_dir=None, schema=None, **kwargs):
+        '''index_record_ids -- if True, record_ids are looked up by primary key in
+        an in-memory index (see record_id_index) instead of a search per lookup
+        snapshot_dir -- if given, df is kept in a snapshot in this directory
+        (see airtable.snapshot) and new processes start from it. Requires pyarrow
+        schema -- TableSchema, or path of a schema JSON file. A file that does
+        not exist yet is written the first time the schema is learned.
+        Writes are checked and coerced against the schema (see table_schema)
+        '''
         self._primary_key = primary_key
         self._df = None
+        self._watermark = None
+        self.index_record_ids = index_record_ids
+        self._record_id_index = None
+        self._write_buffer = None
+        self._table_schema = None
+        self.schema_path = None
+        if isinstance(schema, TableSchema):
+            self._table_schema = schema
+        elif schema is not None:
+            self.schema_path = schema
+            if os.path.exists(schema):
+                self._table_schema = TableSchema.load(schema)
+        self.snapshot_store = None
+        if snapshot_dir is not None:
+            from .snapshot import SnapshotStore
+            self.snapshot_store = SnapshotStore(snapshot_dir)
         super().__init__(*args, **kwargs)
     
     @property
     def df(self):
         if self._df is None:
-            self._df = self.to_df()
+            self.refresh()
         return self._df
     
     @df.setter
     def df(self, df):
         self._df = df
+        self._watermark = None
+
+    def refresh(self, detect_deletions=True):
+        '''Brings df up to date and returns it. The first call downloads the
+        whole table. Later calls only download records created or modified
+        since the previous sync and merge them into df by record_id.
+
+        detect_deletions -- if True, also drops rows of deleted records, found
+            with a scan that only downloads the primary key column (this also
+            rebuilds record_id_index). Pass False to refresh in as few
+            requests as possible.
+        '''
+        sync_time = datetime.datetime.now(datetime.timezone.utc) - self.REFRESH_CLOCK_SKEW
+        if self._df is None and self.snapshot_store is not None:
+            self._load_snapshot()
+        if self._df is None or self._watermark is None:
+            self._df = self._download_df()
+            self._watermark = sync_time
+            self._save_snapshot()
+            return self._df
+
+        formula = AirtableParams.FormulaParam.modified_since(
+            _format_timestamp(self._watermark))
+        changed = airtable_records_to_DataFrame(self.get_all(formula=formula))
+        df = merge_records_into_DataFrame(self._df, changed)
+        if detect_deletions:
+            primary_key = self.primary_key
+            records = self.get_all(fields=[primary_key])
+            self._record_id_index = RecordIdIndex.from_records(primary_key, records)
+            df = df.loc[df.index.isin([record['id'] for record in records])]
+        self._df = df
+        self._watermark = sync_time
+        self._save_snapshot()
+        return df
+
+    @property
+    def snapshot_key(self):
+        from .snapshot import SnapshotStore
+        return SnapshotStore.key(self.base_key, self.table_name)
+
+    def _load_snapshot(self):
+        snapshot = self.snapshot_store.load(self.snapshot_key)
+        if snapshot is None:
+            return
+        self._df, metadata = snapshot
+        self._watermark = datetime.datetime.fromisoformat(metadata['watermark'])
+
+    def _save_snapshot(self):
+        if self.snapshot_store is None:
+            return
+        metadata = {
+            'base_key': self.base_key,
+            'table_name': self.table_name,
+            'watermark': self._watermark.isoformat(),
+            'records': len(self._df),
+        }
+        self.snapshot_store.save(self.snapshot_key, self._df, metadata)
     
     @property
     def primary_key(self):
         if self._primary_key is None:
-            self._primary_key = self.df.columns[0]
+            if self._df is not None:
+                self._primary_key = self._df.columns[0]
+            else:
+                schema = self._table_schema or self.read_schema()
+                self._primary_key = schema.primary_key
         return self._primary_key
+
+    @primary_key.setter
+    def primary_key(self, primary_key):
+        if primary_key != self._primary_key:
+            self._record_id_index = None
+        self._primary_key = primary_key
     
-    def to_df(self):
+    def to_df(self, compact=False, created_time=False, schema=None, sparse=None):
         '''Returns pandas DataFrame of current table. Note that this is slow-
-        takes several seconds for a table with 1000 records.
+        takes several seconds for a table with 1000 records. To keep df up to
+        date without downloading everything again, use refresh.
+
+        With a snapshot_dir, returns a copy of df brought up to date with
+        refresh, starting from the snapshot when there is one.
+
+        compact, schema -- convert columns to compact dtypes, see compact_dtypes
+        created_time -- if True, adds a createdTime column
+        sparse -- density threshold, see sparsify
         '''
-        records = self.get_all()
-        df = airtable_records_to_DataFrame(records)
+        if self.snapshot_store is not None and not created_time:
+            df = self.refresh().copy()
+            if compact:
+                df = compact_dtypes(df, schema=schema)
+            if sparse is not None:
+                df = sparsify(df, sparse)
+            return df
+        return self._download_df(compact=compact, created_time=created_time,
+                                 schema=schema, sparse=sparse)
+
+    def to_df_iter(self, chunk_rows=1000, columns=None, **options):
+        '''Yields the table as DataFrames of at most chunk_rows rows, indexed by
+        record_id, so large tables can be processed in constant memory.
+        options are passed to get_iter (e.g. view, formula, fields, prefetch;
+        prefetch defaults to 1).
+
+        Every chunk has the same columns: columns if given, else the fields
+        option. Otherwise the schema grows as new fields are seen; a chunk has
+        all columns of the chunks before it, in the same order, plus new ones
+        at the end.
+        '''
+        options.setdefault('prefetch', 1)
+        if columns is None:
+            columns = options.get('fields')
+        if isinstance(columns, str):
+            columns = [columns]
+        fixed_schema = columns is not None
+        schema = list(columns) if fixed_schema else []
+
+        def conform(df):
+            if not fixed_schema:
+                schema.extend(column for column in df.columns if column not in schema)
+            return df.reindex(columns=schema)
+
+        builder = DataFrameBuilder()
+        for page in self.get_iter(**options):
+            while page:
+                n_missing = chunk_rows - len(builder)
+                builder.add_records(page[:n_missing])
+                page = page[n_missing:]
+                if len(builder) == chunk_rows:
+                    yield conform(builder.build())
+                    builder = DataFrameBuilder()
+        if len(builder):
+            yield conform(builder.build())
+
+    def to_arrow(self, schema=None, **options):
+        '''Returns the table as a pyarrow.Table, built from the pages of get_iter
+        without a pandas DataFrame in between (see airtable.arrow).
+        options are passed to get_iter (prefetch defaults to 1).
+        schema -- pyarrow.Schema to use instead of inferring types
+        '''
+        from .arrow import records_to_arrow
+        options.setdefault('prefetch', 1)
+        return records_to_arrow(self.get_iter(**options), schema=schema)
+
+    def to_arrow_iter(self, schema=None, **options):
+        '''Yields one pyarrow.RecordBatch per page, see to_arrow'''
+        from .arrow import iter_record_batches
+        options.setdefault('prefetch', 1)
+        return iter_record_batches(self.get_iter(**options), schema=schema)
+
+    def _download_df(self, compact=False, created_time=False, schema=None,
+                     sparse=None):
+        builder = DataFrameBuilder(created_time=created_time, sparse=sparse)
+        for page in self.get_iter(prefetch=1):
+            builder.add_records(page)
+        df = builder.build()
+        if compact:
+            df = compact_dtypes(df, schema=schema)
         return df
 
     
@@ -66,14 +247,264 @@ class PandasAirtable(Airtable):
         '''
         self.s3 = boto3.client('s3', region_name='us-west-1')
                             
+    @property
+    def table_schema(self):
+        '''TableSchema of the table: declared, loaded from schema_path, or
+        learned with learn_schema. None otherwise. When set, the fields of
+        insert / update / batch_insert / batch_update are checked and coerced
+        with it before sending; fields that cannot be sent are left out with a
+        warning.
+        '''
+        return self._table_schema
+
+    @table_schema.setter
+    def table_schema(self, schema):
+        self._table_schema = schema
+
+    def learn_schema(self, sample_size=100):
+        '''Reads the schema (see read_schema) and uses it as table_schema,
+        which turns on the checks of writes. Saves it to schema_path if set.
+        '''
+        schema = self.read_schema(sample_size)
+        if self.schema_path is not None:
+            schema.save(self.schema_path)
+        self._table_schema = schema
+        return schema
+
+    def read_schema(self, sample_size=100):
+        '''Returns the schema from the metadata API, or if that is not available
+        to the API key, infers it from the first sample_size records. Does not
+        change table_schema.
+        '''
+        url = posixpath.join(self.API_URL, 'meta/bases', self.base_key, 'tables')
+        try:
+            tables = self._get(url)['tables']
+            table = next(t for t in tables
+                         if self.table_name in (t['name'], t['id']))
+            schema = TableSchema.from_meta(table)
+        except (requests.exceptions.RequestException, KeyError, StopIteration):
+            records = self.get_all(max_records=sample_size)
+            schema = TableSchema.from_records(records)
+        return schema
+
+    def _check_fields(self, fields):
+        '''Coerces fields with the schema, if known. Fields that cannot be sent
+        are dropped with a warning.
+        '''
+        if self._table_schema is None:
+            return fields
+        fields, failures = self._table_schema.coerce(fields)
+        if failures:
+            print('WARNING: fields not sent: ' + ', '.join(
+                f'{name} ({failure.error})'
+                for failure in failures for name in failure.fields))
+        return fields
+
+    def insert(self, fields, typecast=False):
+        '''Inserts a record. Inside buffered(), queues it and returns a Future'''
+        if self._write_buffer is not None:
+            return self._write_buffer.insert(fields, typecast=typecast)
+        return self._insert_now(fields, typecast=typecast)
+
+    def update(self, record_id, fields, typecast=False):
+        '''Updates a record. Inside buffered(), queues it and returns a Future'''
+        if self._write_buffer is not None:
+            return self._write_buffer.update(record_id, fields, typecast=typecast)
+        return self._update_now(record_id, fields, typecast=typecast)
+
+    def _insert_now(self, fields, typecast=False):
+        return Airtable.insert(self, self._check_fields(fields), typecast=typecast)
+
+    def _update_now(self, record_id, fields, typecast=False):
+        return Airtable.update(self, record_id, self._check_fields(fields),
+                               typecast=typecast)
+
+    def buffered(self, max_delay=1.0):
+        '''Context manager that batches single-record writes. Inside it, insert
+        and update queue the write and return a concurrent.futures.Future of the
+        record. Updates of the same record_id are merged into one PATCH.
+        Writes are sent by a background thread in batch requests of 10 records,
+        as soon as a batch is full or max_delay seconds after the oldest queued
+        write, and the rest on exit.
+
+        >>> with airtable.buffered() as buffer:
+        ...     futures = [airtable.update(record_id, fields) for ...]
+        >>> records = [future.result() for future in futures]
+
+        Rejected records only fail their own futures (see bisect_batch).
+        The robust_* and *_one_field_at_a_time methods are not buffered.
+        '''
+        return WriteBuffer(self, max_delay=max_delay)
+
+    def batch_insert(self, records, typecast=False, max_workers=None):
+        records = [self._check_fields(fields) for fields in records]
+        return Airtable.batch_insert(self, records, typecast=typecast,
+                                     max_workers=max_workers)
+
+    def batch_update(self, records, typecast=False, max_workers=None):
+        records = [dict(record, fields=self._check_fields(record['fields']))
+                   for record in records]
+        return Airtable.batch_update(self, records, typecast=typecast,
+                                     max_workers=max_workers)
+
+    @property
+    def record_id_index(self):
+        '''RecordIdIndex from primary key to record_id. Built on first use with
+        one get_all pass that only downloads the primary key column, then kept
+        current by the writes made through this instance.
+        '''
+        if self._record_id_index is None:
+            self.build_record_id_index()
+        return self._record_id_index
+
+    def build_record_id_index(self):
+        '''(Re)builds record_id_index from the remote table'''
+        primary_key = self.primary_key
+        records = self.get_all(fields=[primary_key])
+        self._record_id_index = RecordIdIndex.from_records(primary_key, records)
+        return self._record_id_index
+
+    def _request(self, method, url, params=None, json_data=None):
+        response = super()._request(method, url, params=params, json_data=json_data)
+        if self._record_id_index is not None and method != 'get':
+            for record in response.get('records', [response]):
+                if method == 'delete':
+                    if record.get('deleted'):
+                        self._record_id_index.discard(record['id'])
+                else:
+                    self._record_id_index.add(record)
+        return response
+
+    def _use_record_id_index(self, field_name):
+        return self.index_record_ids and field_name == self._primary_key
+
     def get_record_id(self, field_name, field_value):
-        recs = self.search(field_name=field_name, field_value=field_value)
+        if self._use_record_id_index(field_name):
+            recs = [{'id': record_id} for record_id in self.record_id_index.get(field_value)]
+        else:
+            recs = self.search(field_name=field_name, field_value=field_value)
         if len(recs) == 1:
             return recs[0]['id']
         elif len(recs) == 0:
             print('No matching records')
         elif len(recs) > 1:
             print('More than one matching record')
+
+    def get_record_ids(self, field_name, field_values):
+        '''Bulk version of get_record_id. Resolves all values with a few
+        search_many requests instead of one search per value.
+        Returns a dict of value -> record_id. Values with no match or with
+        more than one match map to None.
+        '''
+        matches = match_record_ids(self, field_name, field_values)
+        record_ids = {}
+        n_duplicated = 0
+        for value, recs in matches.items():
+            if len(recs) == 1:
+                record_ids[value] = recs[0]
+            else:
+                record_ids[value] = None
+                n_duplicated += len(recs) > 1
+        if n_duplicated:
+            print(f'More than one matching record for {n_duplicated} values')
+        return record_ids
+
+    def bulk_upsert(self, df, key=None, overwrite=True, typecast=True,
+                    robust=True, max_workers=None):
+        '''Upserts the rows of df, matched to records on the key column
+        (primary key by default). All keys are resolved in one pass, rows are
+        split into inserts and updates with a merge and both groups are sent
+        in batches of 10.
+
+        overwrite -- if False, rows whose key already exists are skipped
+        robust -- if True, rejected batches are bisected to isolate the bad
+            records, which are written with robust_insert / robust_update
+
+        Returns a DataFrame indexed like df with columns record_id, action
+        ('insert', 'update', 'skipped' or 'error') and error.
+        '''
+        if key is None:
+            key = self.primary_key
+        return _bulk_upsert(self, df, key, overwrite=overwrite, typecast=typecast,
+                            robust=robust, max_workers=max_workers)
+
+    def reconcile(self, df, key=None, delete=False, dry_run=False, typecast=True,
+                  max_workers=None):
+        '''Makes the table match df with as few writes as possible. Only the
+        columns of df are downloaded. Rows are matched on the key column
+        (primary key by default) and compared by hashing normalized values, so
+        only new rows are inserted and only the changed cells of changed rows
+        are updated.
+
+        Rows with an empty key are skipped, and of rows with the same key only
+        the first is used, with a warning.
+
+        delete -- if True, also deletes records whose key is not in df
+            (records with an empty key are left alone)
+        dry_run -- if True, only returns the plan. Apply it later with
+            plan.apply()
+
+        Returns a ReconcilePlan.
+        '''
+        if key is None:
+            key = self.primary_key
+        columns = list(df.columns)
+        if key not in columns:
+            raise ValueError(f'key {key!r} is not a column of df')
+        remote = airtable_records_to_DataFrame(self.get_all(fields=columns))
+        remote = remote.reindex(columns=columns)
+
+        local_cells = _normalize_cells(df)
+        remote_cells = _normalize_cells(remote)
+        # hashes stay Python ints, NaN (for no match) would turn uint64 to float
+        local_hashes = pd.util.hash_pandas_object(local_cells, index=False).to_numpy(object)
+        remote_hashes = pd.util.hash_pandas_object(remote_cells, index=False)
+
+        local_keys = local_cells[key]
+        no_key = (local_keys == 'null').to_numpy()
+        duplicated = (local_keys.duplicated() & ~no_key).to_numpy()
+        if no_key.any():
+            print(f'WARNING: {no_key.sum()} rows without {key} are skipped')
+        if duplicated.any():
+            print(f'WARNING: {duplicated.sum()} rows repeat the {key} of an earlier '
+                  'row, the first row is used')
+        used = ~(no_key | duplicated)
+
+        remote_keys = remote_cells[key][remote_cells[key] != 'null']
+        n_duplicated = remote_keys.duplicated().sum()
+        if n_duplicated:
+            print(f'WARNING: {n_duplicated} keys match more than one record, '
+                  'the first match is used')
+        matches = pd.DataFrame({
+            '_key': remote_keys.to_numpy(),
+            '_record_id': remote_keys.index.to_numpy(),
+            '_hash': remote_hashes[remote_keys.index].to_numpy(object),
+        }).drop_duplicates('_key')
+        merged = pd.DataFrame({'_key': local_keys.to_numpy()}).merge(
+            matches, on='_key', how='left', sort=False, validate='many_to_one')
+
+        matched = merged['_record_id'].notna().to_numpy() & used
+        differs = matched & (merged['_hash'].to_numpy() != local_hashes)
+        fields = DataFrame_to_airtable_fields(df)
+        inserts = [fields[i] for i in np.flatnonzero(~matched & used)]
+        updates = []
+        for i in np.flatnonzero(differs):
+            record_id = merged['_record_id'].iat[i]
+            changed = local_cells.iloc[i] != remote_cells.loc[record_id]
+            # empty sparse cells are left out of fields, send them as cleared
+            updates.append({'id': record_id,
+                            'fields': {name: fields[i].get(name)
+                                       for name in changed.index[changed]}})
+        deletes = []
+        if delete:
+            present = set(local_keys)
+            deletes = [record_id for record_id, value in remote_keys.items()
+                       if value not in present]
+        plan = ReconcilePlan(self, inserts, updates, deletes,
+                             unchanged=int((matched & ~differs).sum()))
+        if not dry_run:
+            plan.apply(typecast=typecast, max_workers=max_workers)
+        return plan
     
     def get(self, record_id, as_series=True):
         if as_series:
@@ -84,14 +515,21 @@ class PandasAirtable(Airtable):
             return Airtable.get(self,record_id=record_id)
         
     
-    def get_many(self, record_ids, as_df=True):
-        records = [Airtable.get(self, record_id=record_id) for record_id in record_ids]
+    def get_many(self, record_ids, as_df=True, return_missing=False, **options):
+        '''Fetches records by id, a few hundred per request (see Airtable.get_many).
+        Results keep the order of record_ids. If return_missing is True, also
+        returns the list of ids that were not found.
+        '''
+        records, missing = Airtable.get_many(
+            self, record_ids, return_missing=True, **options)
         if as_df:
-            df = airtable_records_to_DataFrame(records)
-            df.af.table = self
-            return df
+            result = airtable_records_to_DataFrame(records)
+            result.af.table = self
         else:
-            return records
+            result = records
+        if return_missing:
+            return result, missing
+        return result
     
     def __enter__(self):
         global context_table
@@ -123,51 +561,67 @@ class PandasAirtable(Airtable):
             return self.robust_insert(fields=fields, typecast=typecast)
 
     def robust_insert(self, fields, typecast=True):
-        try:
-            fields = {k:typecast_airtable_value(v) for k,v in fields.items()}
-            return self.insert(fields, typecast=typecast)
-        except:
-            return self.insert_one_field_at_a_time(fields=fields, typecast=typecast)
-        
-    def robust_update(self, record_id, fields,typecast=True):
-        
-        fields = {k:typecast_airtable_value(v) for k,v in fields.items()}
-        
-        try:
-            return self.update(
-                record_id=record_id,
-                fields=fields,
-                typecast=True,
-            )
-        except:
-            return self.update_one_field_at_a_time(record_id, fields, typecast=typecast)
-                        
+        '''Inserts a record. If the API rejects some of the values, the fields
+        are bisected to write all the others (see bisect_insert).
+        Returns a WriteReport.
+        '''
+        return robust_insert_record(self, fields, typecast=typecast)
+
+    def robust_update(self, record_id, fields, typecast=True):
+        '''Updates a record. If the API rejects some of the values, the fields
+        are bisected to write all the others (see bisect_update).
+        Returns a WriteReport.
+        '''
+        return robust_update_record(self, record_id, fields, typecast=typecast)
+
+    def bisect_insert(self, fields, typecast=True, rejected=False):
+        '''Inserts a record with as many of fields as the API accepts.
+        See bisect_insert_record.
+        '''
+        return bisect_insert_record(self, fields, typecast=typecast, rejected=rejected)
+
+    def bisect_update(self, record_id, fields, typecast=True, rejected=False):
+        '''Updates a record with as many of fields as the API accepts.
+        See bisect_update_record.
+        '''
+        return bisect_update_record(self, record_id, fields, typecast=typecast,
+                                    rejected=rejected)
+
     def insert_one_field_at_a_time(self, fields, typecast=True):
-        record = None
-        for key,val in fields.items():
+        '''Inserts a record one field per request. Returns a WriteReport.
+        bisect_insert needs far fewer requests.
+        '''
+        report = WriteReport()
+        items = list(fields.items())
+        for i, (key, val) in enumerate(items):
             try:
-                record = self.insert(fields={key:val}, typecast=typecast)
-            except:
-                pass
-            if record is not None:
-                break
-        record_id = record['id']
-        return self.update_one_field_at_a_time(record_id, fields, typecast=typecast)
+                report.update(self._insert_now(fields={key: val}, typecast=typecast))
+            except requests.exceptions.HTTPError as exc:
+                report.failures.append(WriteFailure({key: val}, _error_message(exc)))
+                continue
+            rest = self.update_one_field_at_a_time(report['id'], dict(items[i + 1:]),
+                                                   typecast=typecast)
+            report.update(rest)
+            report.failures.extend(rest.failures)
+            break
+        return report
         
     def update_one_field_at_a_time(self, record_id, fields, typecast=True):
-        outputs = {'fails':[]}
+        '''Updates a record one field per request. Returns a WriteReport.
+        bisect_update needs far fewer requests.
+        '''
+        report = WriteReport()
         for key,val in fields.items():
             try:
-                field = {key: val}
-                record = self.update(
+                record = self._update_now(
                             record_id=record_id,
-                            fields=field,
+                            fields={key: val},
                             typecast=typecast,
                         )
-                outputs.update(record)
-            except:
-                outputs['fails'].append({'fields':field})
-        return outputs
+                report.update(record)
+            except requests.exceptions.HTTPError as exc:
+                report.failures.append(WriteFailure({key: val}, _error_message(exc)))
+        return report
     
     def upload_attachment_to_airtable_via_s3(
         self,
@@ -233,6 +687,263 @@ class PandasAirtable(Airtable):
 
        
     
+
+
+class WriteReport(dict):
+    '''Result of a robust write: the record as last returned by the API (empty
+    if nothing could be written), plus failures, a list of WriteFailure for
+    the fields that were rejected.
+    '''
+
+    def __init__(self, record=None, failures=None):
+        super().__init__(record or {})
+        self.failures = list(failures or [])
+
+    @property
+    def ok(self):
+        return not self.failures
+
+    @property
+    def failed_fields(self):
+        return [name for failure in self.failures for name in failure.fields]
+
+
+class ReconcilePlan(object):
+    '''Writes that make a table match a DataFrame, see PandasAirtable.reconcile
+
+    inserts -- list of field dicts of the records to create
+    updates -- list of {'id': record_id, 'fields': changed fields}
+    deletes -- list of record_ids to delete
+    unchanged -- number of rows that already match
+    results -- after apply, dict of 'inserted', 'updated' and 'deleted' records
+    '''
+
+    def __init__(self, table, inserts, updates, deletes, unchanged=0):
+        self.table = table
+        self.inserts = inserts
+        self.updates = updates
+        self.deletes = deletes
+        self.unchanged = unchanged
+        self.results = None
+
+    def __len__(self):
+        '''Number of records to write'''
+        return len(self.inserts) + len(self.updates) + len(self.deletes)
+
+    def apply(self, typecast=True, max_workers=None):
+        '''Sends the planned writes through the batch endpoints'''
+        table = self.table
+        self.results = {
+            'inserted': table.batch_insert(self.inserts, typecast=typecast,
+                                           max_workers=max_workers),
+            'updated': table.batch_update(self.updates, typecast=typecast,
+                                          max_workers=max_workers),
+            'deleted': table.batch_delete(self.deletes, max_workers=max_workers),
+        }
+        return self.results
+
+    def __repr__(self):
+        return (f'<ReconcilePlan inserts:{len(self.inserts)} updates:{len(self.updates)} '
+                f'deletes:{len(self.deletes)} unchanged:{self.unchanged}>')
+
+
+class WriteBuffer(object):
+    '''Write-behind buffer of single-record writes, see PandasAirtable.buffered
+
+    max_delay -- seconds a write may wait for its batch to fill up
+    batch_size -- records per request, at most the API limit of 10
+    '''
+
+    def __init__(self, table, max_delay=1.0, batch_size=None):
+        self.table = table
+        self.max_delay = max_delay
+        self.batch_size = batch_size or table.MAX_RECORDS_PER_REQUEST
+        # (kind, typecast) -> OrderedDict of key -> [record_id, fields, futures]
+        # Inserts are keyed by a counter, updates by record_id so they merge.
+        self._pending = OrderedDict()
+        self._oldest = None  # time.monotonic() of the oldest pending write
+        self._counter = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        self._send_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        self.table._write_buffer = self
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if self.table._write_buffer is self:
+            self.table._write_buffer = None
+        self.close()
+
+    def __len__(self):
+        '''Number of pending records'''
+        with self._condition:
+            return sum(len(entries) for entries in self._pending.values())
+
+    def insert(self, fields, typecast=False):
+        with self._condition:
+            self._counter += 1
+            return self._add('insert', typecast, self._counter, None, fields)
+
+    def update(self, record_id, fields, typecast=False):
+        with self._condition:
+            return self._add('update', typecast, record_id, record_id, fields)
+
+    def _add(self, kind, typecast, key, record_id, fields):
+        if self._closed:
+            raise RuntimeError('WriteBuffer is closed')
+        future = Future()
+        entries = self._pending.setdefault((kind, typecast), OrderedDict())
+        if key in entries:
+            entries[key][1].update(fields)
+            entries[key][2].append(future)
+        else:
+            entries[key] = [record_id, dict(fields), [future]]
+        if self._oldest is None:
+            self._oldest = time.monotonic()
+        self._condition.notify()
+        return future
+
+    def _take(self, force=False):
+        '''Removes and returns the batches due: full ones, or all if force or
+        the oldest write has waited max_delay. Call with the condition held.
+        '''
+        if self._oldest is None:
+            return []
+        if not force:
+            force = time.monotonic() - self._oldest >= self.max_delay
+        batches = []
+        for (kind, typecast), entries in list(self._pending.items()):
+            while len(entries) >= self.batch_size or (force and entries):
+                keys = list(entries)[:self.batch_size]
+                batches.append((kind, typecast, [entries.pop(key) for key in keys]))
+            if not entries:
+                del self._pending[(kind, typecast)]
+        if not self._pending:
+            self._oldest = None
+        return batches
+
+    def _run(self):
+        while True:
+            with self._condition:
+                batches = self._take()
+                while not batches and not self._closed:
+                    timeout = None
+                    if self._oldest is not None:
+                        timeout = max(0, self._oldest + self.max_delay - time.monotonic())
+                    self._condition.wait(timeout)
+                    batches = self._take()
+                if not batches and self._closed:
+                    return
+            self._send(batches)
+
+    def flush(self):
+        '''Sends all pending writes now and waits for them'''
+        with self._condition:
+            batches = self._take(force=True)
+        self._send(batches)
+
+    def close(self):
+        '''Sends the pending writes and stops the background thread'''
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+        self.flush()
+
+    def _send(self, batches):
+        with self._send_lock:
+            for kind, typecast, entries in batches:
+                self._send_batch(kind, typecast, entries)
+
+    def _send_batch(self, kind, typecast, entries):
+        entries = [entry for entry in entries
+                   if [future for future in entry[2]
+                       if future.set_running_or_notify_cancel()]]
+        if not entries:
+            return
+        table = self.table
+
+        def send(chunk):
+            if kind == 'insert':
+                return table.batch_insert([fields for _, fields, _ in chunk],
+                                          typecast=typecast)
+            return table.batch_update(
+                [{'id': record_id, 'fields': fields} for record_id, fields, _ in chunk],
+                typecast=typecast)
+
+        try:
+            results = bisect_batch(send, entries, lambda entry, exc: exc)
+        except Exception as exc:
+            results = [exc] * len(entries)
+        for (_, _, futures), result in zip(entries, results):
+            for future in futures:
+                if future.running():
+                    if isinstance(result, Exception):
+                        future.set_exception(result)
+                    else:
+                        future.set_result(result)
+
+    def __repr__(self):
+        return f'<WriteBuffer table:{self.table.table_name} pending:{len(self)}>'
+
+
+class RecordIdIndex(object):
+    '''In-memory hash index from the values of one field to record_ids'''
+
+    def __init__(self, field_name):
+        self.field_name = field_name
+        self._record_ids = {}  # field value -> list of record_ids
+        self._keys = {}  # record_id -> field value
+
+    @classmethod
+    def from_records(cls, field_name, records):
+        index = cls(field_name)
+        for record in records:
+            index.add(record)
+        return index
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key):
+        return bool(self.get(key))
+
+    def add(self, record):
+        '''Indexes (or re-indexes) an Airtable record dict'''
+        record_id = record['id']
+        self.discard(record_id)
+        key = record.get('fields', {}).get(self.field_name)
+        if key is None:
+            return
+        try:
+            self._record_ids.setdefault(key, []).append(record_id)
+        except TypeError:  # unhashable field value
+            return
+        self._keys[record_id] = key
+
+    def discard(self, record_id):
+        key = self._keys.pop(record_id, None)
+        if key is None:
+            return
+        record_ids = self._record_ids[key]
+        record_ids.remove(record_id)
+        if not record_ids:
+            del self._record_ids[key]
+
+    def get(self, key):
+        '''Returns the list of record_ids whose field equals key'''
+        try:
+            return list(self._record_ids.get(key, []))
+        except TypeError:
+            return []
+
+    def __repr__(self):
+        return f'<RecordIdIndex field:{self.field_name} records:{len(self)}>'
+
                             
 @pd.api.extensions.register_series_accessor('af')
 class AirRow:
@@ -266,7 +977,7 @@ class AirRow:
      
     @property
     def fields(self):
-        return self.series.convert_dtypes().to_dict()
+        return Series_to_airtable_fields(self.series)
     
     @property
     def table_name(self):
@@ -279,7 +990,8 @@ class AirRow:
     def record_id(self):
         '''If you manually set the record_id attribute, it will keep that one
         otherwise it will use the name of the series if it looks like a record_id
-        lastly, it will query Airtable on its primary key
+        lastly, it will look it up by its primary key, using the table's
+        record_id_index when enabled (see PandasAirtable.record_id_index)
         '''
         if self._record_id is None:
             if self._check_if_name_is_rec_id():
@@ -421,6 +1133,7 @@ class AirDataFrame:
         self._df = df
         self._table = table
         self._primary_key = primary_key
+        self.pulled = None  # copy of the frame as returned by get / refresh
     
     @property
     def df(self):
@@ -474,6 +1187,13 @@ class AirDataFrame:
         'Pulls data from Airtable and reconstructs parent DataFrame'
         self._df = self.table.to_df()
         return self._reconstruct()
+
+    def refresh(self, detect_deletions=True):
+        '''Like get, but only downloads the records changed since the table was
+        last synced (see PandasAirtable.refresh)
+        '''
+        self._df = self.table.refresh(detect_deletions=detect_deletions)
+        return self._reconstruct()
     
     def get_row(self, index):
         row = self.df.iloc[index]
@@ -485,28 +1205,72 @@ class AirDataFrame:
         _df = pd.DataFrame(self._df)
         _df.af.table = self.table
         _df.af.primary_key = self.primary_key
+        _df.af.pulled = self._df.copy()
         return _df
+
+    def changed_cells(self):
+        '''Boolean DataFrame shaped like the frame, True for cells that differ
+        from the frame pulled by get / refresh. Rows and columns that were not
+        pulled are all True. Lists are compared by value, so edit list cells by
+        assigning a new list rather than mutating them in place.
+        '''
+        if self.pulled is None:
+            raise ValueError('No pulled frame to compare with, use af.get() first')
+        return changed_cells(self.df, self.pulled)
     
-    def _prep_df(self,
-                primary_key=None,
-                airtable=None,
-                index=None,
-                columns=None, 
-                ):
+    def _resolve_airtable(self, airtable=None):
         if airtable is None:
             airtable = self.table
         assert airtable is not None
-        
+        return airtable
+
+    def _select_rows(self, index=None):
+        '''Returns the selected rows and their positions in the parent DataFrame'''
+        positions = np.arange(len(self.df))
+        if index is not None:
+            positions = pd.Series(positions, index=self.df.index).loc[index]
+            positions = np.atleast_1d(np.asarray(positions))
+        return self.df.iloc[positions], positions
+
+    def _resolve_record_ids(self, airtable, primary_key, rows):
+        '''record_ids of rows, from a record_id index or else by primary key.
+        Rows without a matching record get None.
+        '''
+        if rows.index.name == 'record_id':
+            return list(rows.index)
         if primary_key is None:
             primary_key = self.primary_key
-        
-        df = self.df
-        if columns is not None:
-            df = df.loc[:, columns]
-        if index is not None:
-            df = df.loc[index, :]
-        return airtable, primary_key, df
-    
+        return lookup_record_ids(airtable, primary_key, rows[primary_key].tolist())
+
+    def _set_record_ids(self, positions, record_ids, partial=True):
+        '''Writes record_ids back into the index of the parent DataFrame
+
+        partial -- if False, the index is left as is unless every row got a
+            record_id, so labels and record_ids are not mixed
+        '''
+        if not partial and any(record_id is None for record_id in record_ids):
+            return
+        index = self.df.index.to_numpy(dtype=object).copy()
+        for position, record_id in zip(positions, record_ids):
+            if record_id is not None:
+                index[position] = record_id
+        if all(_looks_like_record_id(label) for label in index):
+            name = 'record_id'
+        else:
+            name = self.df.index.name
+        self.df.index = pd.Index(index, name=name)
+
+    def _write(self, airtable, send, items, fallback=None, max_workers=None):
+        '''Sends items in batches of 10. If a fallback is given, batches rejected
+        by the API are bisected (see bisect_batch) and rejected items are
+        written with the fallback.
+        '''
+        def write(chunk):
+            if fallback is None:
+                return send(chunk)
+            return bisect_batch(send, chunk, lambda item, exc: fallback(item))
+        return airtable._send_chunks(write, items, max_workers=max_workers)
+
     def update(self,
                primary_key=None,
                airtable=None,
@@ -514,20 +1278,64 @@ class AirDataFrame:
                columns=None,
                typecast=True,
                robust=True,
+               max_workers=None,
+               only_changed=True,
                ):
-        
-        airtable, primary_key, df = self._prep_df(primary_key=primary_key,
-            airtable=airtable, index=index, columns=columns)
-        
-        records = []
-        for row_index, row in df.iterrows():
-            row.af.table = airtable
-            if df.index.name == 'record_id':
-                row.af.record_id = row_index
-            else:
-                row.af.primary_key = primary_key
-            _rec = row.af.update(typecast=typecast, robust=robust)
-            records.append(_rec)
+        '''Updates the rows of the DataFrame in batches of 10 records.
+        Rows are matched by record_id index, or else by primary key.
+
+        only_changed -- if the frame was pulled with get / refresh and is
+            indexed by record_id, only sends the cells that changed since
+            (see changed_cells), and skips unchanged rows
+
+        Returns the updated records in row order, None for rows without a
+        matching record or without changes.
+        '''
+        airtable = self._resolve_airtable(airtable)
+        rows, positions = self._select_rows(index)
+        record_ids = self._resolve_record_ids(airtable, primary_key, rows)
+        if columns is not None:
+            rows = rows.loc[:, columns]
+        n_unmatched = sum(record_id is None for record_id in record_ids)
+        if n_unmatched:
+            print(f'{n_unmatched} rows without matching record were not updated')
+
+        if only_changed and self.pulled is not None and rows.index.name == 'record_id':
+            changed = changed_cells(rows, self.pulled)
+            dirty = changed.any(axis=1).to_numpy()
+            record_ids = [record_id if is_dirty else None
+                          for record_id, is_dirty in zip(record_ids, dirty)]
+            fields = DataFrame_to_airtable_fields(rows[dirty])
+            masks = changed.to_numpy()[dirty]
+            # empty sparse cells are left out of fields, send them as cleared
+            fields = iter([{name: f.get(name) for name in rows.columns[mask]}
+                           for f, mask in zip(fields, masks)])
+            fields = [next(fields) if is_dirty else None for is_dirty in dirty]
+            record_ids = [record_id if f else None
+                          for record_id, f in zip(record_ids, fields)]
+        else:
+            fields = DataFrame_to_airtable_fields(rows)
+
+        items = [{'id': record_id, 'fields': f}
+                 for record_id, f in zip(record_ids, fields) if record_id is not None]
+        def fallback(item):
+            return airtable.robust_update(item['id'], item['fields'],
+                                          typecast=typecast)
+        updated = self._write(
+            airtable,
+            lambda chunk: airtable.batch_update(chunk, typecast=typecast),
+            items,
+            fallback=fallback if robust else None,
+            max_workers=max_workers,
+        )
+        updated = iter(updated)
+        records = [next(updated) if record_id is not None else None
+                   for record_id in record_ids]
+        self._set_record_ids(positions, [r.get('id') if r else None for r in records],
+                             partial=False)
+        if self.pulled is not None and self.df.index.name == 'record_id':
+            sent = [item['id'] for item in items]
+            self.pulled = merge_records_into_DataFrame(self.pulled, self.df.loc[sent])
         return records
             
     def insert(self,
@@ -537,17 +1345,27 @@ class AirDataFrame:
                columns=None,
                typecast=True,
                robust=True,
+               max_workers=None,
                ):
-        
-        airtable, primary_key, df = self._prep_df(primary_key=primary_key,
-            airtable=airtable, index=index, columns=columns)
-        
-        records = []
-        for row_index, row in df.iterrows():
-            row.af.table = airtable
-            row.af.primary_key = primary_key
-            _rec = row.af.insert(typecast=typecast, robust=robust)
-            records.append(_rec)
+        '''Inserts the rows of the DataFrame in batches of 10 records and writes
+        the new record_ids into the index. Returns the inserted records.
+        '''
+        airtable = self._resolve_airtable(airtable)
+        rows, positions = self._select_rows(index)
+        if columns is not None:
+            rows = rows.loc[:, columns]
+        fields = DataFrame_to_airtable_fields(rows)
+
+        def fallback(f):
+            return airtable.robust_insert(f, typecast=typecast)
+        records = self._write(
+            airtable,
+            lambda chunk: airtable.batch_insert(chunk, typecast=typecast),
+            fields,
+            fallback=fallback if robust else None,
+            max_workers=max_workers,
+        )
+        self._set_record_ids(positions, [r.get('id') if r else None for r in records])
         return records
     
     def upsert(self,
@@ -557,51 +1375,708 @@ class AirDataFrame:
                columns=None,
                typecast=True,
                robust=True,
+               max_workers=None,
                ):
-        
-        airtable, primary_key, df = self._prep_df(primary_key=primary_key,
-            airtable=airtable, index=index, columns=columns)
-        
-        records = []
-        for row_index, row in df.iterrows():
-            row.af.table = airtable
-            if df.index.name == 'record_id':
-                row.af.record_id = row_index
-            else:
-                row.af.primary_key = primary_key
-            _rec = row.af.upsert(typecast=typecast, robust=robust)
-            records.append(_rec)
+        '''Updates rows that match a record (by record_id index, or else by
+        primary key) and inserts the others, in batches of 10 records.
+        Returns the records in row order.
+        '''
+        airtable = self._resolve_airtable(airtable)
+        rows, positions = self._select_rows(index)
+        record_ids = self._resolve_record_ids(airtable, primary_key, rows)
+        if columns is not None:
+            rows = rows.loc[:, columns]
+        fields = DataFrame_to_airtable_fields(rows)
+
+        to_update = [{'id': record_id, 'fields': f}
+                     for record_id, f in zip(record_ids, fields) if record_id is not None]
+        to_insert = [f for record_id, f in zip(record_ids, fields) if record_id is None]
+        def update_fallback(item):
+            return airtable.robust_update(item['id'], item['fields'],
+                                          typecast=typecast)
+
+        def insert_fallback(f):
+            return airtable.robust_insert(f, typecast=typecast)
+        updated = self._write(
+            airtable,
+            lambda chunk: airtable.batch_update(chunk, typecast=typecast),
+            to_update,
+            fallback=update_fallback if robust else None,
+            max_workers=max_workers,
+        )
+        inserted = self._write(
+            airtable,
+            lambda chunk: airtable.batch_insert(chunk, typecast=typecast),
+            to_insert,
+            fallback=insert_fallback if robust else None,
+            max_workers=max_workers,
+        )
+        updated, inserted = iter(updated), iter(inserted)
+        records = [next(updated) if record_id is not None else next(inserted)
+                   for record_id in record_ids]
+        self._set_record_ids(positions, [r.get('id') if r else None for r in records],
+                             partial=False)
         return records
             
     def delete(self,
                primary_key=None,
                airtable=None,
                index=None,
-               columns=None
+               columns=None,
+               max_workers=None,
                ):
-        
-        airtable, primary_key, df = self._prep_df(primary_key=primary_key,
-            airtable=airtable, index=index, columns=columns)
-        
-        records = []
-        for row_index, row in df.iterrows():
-            row.af.table = airtable
-            if df.index.name == 'record_id':
-                row.af.record_id = row_index
-            else:
-                row.af.primary_key = primary_key
-            _rec = row.af.delete()
-            records.append(_rec)
-        return records
+        '''Deletes the records matching the rows of the DataFrame, in batches
+        of 10. Returns the deleted records in row order, None for rows without
+        a matching record.
+        '''
+        airtable = self._resolve_airtable(airtable)
+        rows, _ = self._select_rows(index)
+        record_ids = self._resolve_record_ids(airtable, primary_key, rows)
+        to_delete = [record_id for record_id in record_ids if record_id is not None]
+        deleted = iter(airtable.batch_delete(to_delete, max_workers=max_workers))
+        return [next(deleted) if record_id is not None else None
+                for record_id in record_ids]
     
 def airtable_record_to_Series(record):
     return pd.Series(record['fields'], name=record['id'])
     
-def airtable_records_to_DataFrame(records):
-    df = pd.DataFrame.from_records((r['fields'] for r in records), index=[
-            record['id'] for record in records])
-    df.index.name = 'record_id'
+class DataFrameBuilder(object):
+    '''Accumulates pages of Airtable records column by column and builds a
+    DataFrame indexed by record_id. Only the field values are kept, so pages
+    can be released as soon as they are added. Columns are ordered by first
+    appearance and cells of fields missing from a record are NaN.
+
+    created_time -- if True, the createdTime of the records is added as a
+    datetime64 column named createdTime
+    sparse -- density threshold, columns below it are built as sparse arrays
+        straight from their populated cells (see sparsify). Only the columns
+        above it are ever padded to full length.
+    '''
+
+    def __init__(self, created_time=False, sparse=None):
+        self.created_time = created_time
+        self.sparse = sparse
+        self._created_times = []
+        self._record_ids = []
+        # field name -> values, padded with NaN for missing fields, or with
+        # sparse, field name -> (positions, values) of the populated cells
+        self._columns = {}
+
+    def __len__(self):
+        return len(self._record_ids)
+
+    def add_records(self, records):
+        record_ids = self._record_ids
+        columns = self._columns
+        for record in records:
+            position = len(record_ids)
+            record_ids.append(record['id'])
+            if self.created_time:
+                self._created_times.append(record.get('createdTime'))
+            if self.sparse is not None:
+                for name, value in record['fields'].items():
+                    column = columns.get(name)
+                    if column is None:
+                        column = columns[name] = ([], [])
+                    column[0].append(position)
+                    column[1].append(value)
+                continue
+            for name, value in record['fields'].items():
+                column = columns.get(name)
+                if column is None:
+                    column = columns[name] = []
+                if len(column) < position:
+                    column.extend([np.nan] * (position - len(column)))
+                column.append(value)
+
+    def build(self):
+        n_rows = len(self._record_ids)
+        data = {}
+        for name, values in self._columns.items():
+            if self.sparse is not None:
+                positions, values = values
+                if len(positions) < self.sparse * n_rows:
+                    data[name] = _sparse_array(positions, values, n_rows)
+                    continue
+                padded = [np.nan] * n_rows
+                for position, value in zip(positions, values):
+                    padded[position] = value
+                values = padded
+            elif len(values) < n_rows:
+                values = values + [np.nan] * (n_rows - len(values))
+            data[name] = values
+        index = pd.Index(self._record_ids, dtype=object, name='record_id')
+        df = pd.DataFrame(data, index=index, columns=list(data))
+        if self.created_time:
+            df['createdTime'] = _parse_datetimes(
+                pd.Series(self._created_times, index=index, dtype=object))
+        return df
+
+
+def _sparse_array(positions, values, length):
+    '''SparseArray of length with values at positions and NaN elsewhere, with
+    the dtype the column would have as a dense, NaN padded column
+    '''
+    values = pd.Series(values)
+    dtype = float if values.dtype.kind in 'iuf' else object
+    sparse_dtype = pd.SparseDtype(dtype, np.nan)
+    try:
+        # private, avoids a dense column; missing from some pandas versions
+        from pandas._libs.sparse import IntIndex
+    except ImportError:
+        values.index = positions
+        return pd.arrays.SparseArray(
+            values.astype(dtype).reindex(range(length)), dtype=sparse_dtype)
+    return pd.arrays.SparseArray(
+        values.to_numpy(dtype=dtype),
+        sparse_index=IntIndex(length, np.asarray(positions, dtype=np.int32)),
+        dtype=sparse_dtype)
+
+
+def airtable_records_to_DataFrame(records, compact=False, created_time=False,
+                                  schema=None, sparse=None):
+    '''compact, schema -- convert columns to compact dtypes, see compact_dtypes
+    created_time -- if True, adds a createdTime column
+    sparse -- density threshold, see sparsify
+    '''
+    builder = DataFrameBuilder(created_time=created_time, sparse=sparse)
+    builder.add_records(records)
+    df = builder.build()
+    if compact:
+        df = compact_dtypes(df, schema=schema)
+    return df
+
+
+# Airtable field types -> conversion used by compact_dtypes
+FIELD_TYPE_CONVERSIONS = {
+    'checkbox': 'boolean',
+    'singleSelect': 'category',
+    'date': 'datetime',
+    'dateTime': 'datetime',
+    'createdTime': 'datetime',
+    'lastModifiedTime': 'datetime',
+    'number': 'numeric',
+    'currency': 'numeric',
+    'percent': 'numeric',
+    'duration': 'numeric',
+    'rating': 'numeric',
+    'count': 'numeric',
+    'autoNumber': 'numeric',
+}
+
+_ISO_DATE = re.compile(
+    r'\d{4}-\d{2}-\d{2}(T\d{2}:\d{2}(:\d{2}(\.\d+)?)?(Z|[+-]\d{2}:?\d{2})?)?')
+
+
+def compact_dtypes(df, schema=None, category_threshold=0.5):
+    '''Returns a copy of df with compact dtypes:
+    - checkbox and all-boolean columns -> boolean (missing checkboxes are False)
+    - numbers -> Int64 when all values are whole, else float64
+    - ISO 8601 date strings -> datetime64 (UTC when a time is included)
+    - single select and low-cardinality text -> category
+    Columns holding lists or dicts (linked records, attachments...) and
+    sparse columns are left as they are.
+
+    schema -- dict of field name -> Airtable field type (e.g. 'singleSelect',
+        'number', 'dateTime'). Typed fields are converted according to
+        FIELD_TYPE_CONVERSIONS, the others are inferred from their values
+    category_threshold -- text columns whose number of distinct values is at
+        most this fraction of their non-missing values become category
+    '''
+    schema = schema or {}
+    df = df.copy()
+    for column in df.columns:
+        kind = FIELD_TYPE_CONVERSIONS.get(schema.get(column))
+        df[column] = _compact_column(df[column], kind, category_threshold)
     return df
+
+
+def _compact_column(values, kind, category_threshold):
+    if isinstance(values.dtype, pd.SparseDtype):
+        return values
+    if kind == 'boolean':
+        return values.astype('boolean').fillna(False)
+    if kind == 'category':
+        return values.astype('category')
+    if kind == 'datetime':
+        return _parse_datetimes(values)
+    if kind == 'numeric':
+        return _compact_numbers(pd.to_numeric(values, errors='coerce'))
+
+    if pd.api.types.is_bool_dtype(values) or isinstance(values.dtype, pd.CategoricalDtype):
+        return values
+    if pd.api.types.is_numeric_dtype(values):
+        return _compact_numbers(values)
+    if not (values.dtype == object or pd.api.types.is_string_dtype(values)):
+        return values
+
+    present = values.dropna()
+    if present.empty:
+        return values
+    types = set(present.map(type))
+    if types <= {bool, np.bool_}:
+        return values.astype('boolean')
+    if types != {str}:
+        return values
+    if present.str.fullmatch(_ISO_DATE).all():
+        return _parse_datetimes(values)
+    if present.nunique() <= category_threshold * len(present):
+        return values.astype('category')
+    return values
+
+
+def sparsify(df, threshold=0.5):
+    '''Returns a copy of df where object and float columns with fewer than
+    threshold (a fraction) populated cells are pandas sparse arrays, so their
+    memory scales with the populated cells. Airtable omits empty fields, which
+    makes wide tables mostly NaN.
+    DataFrame_to_airtable_fields only sends the populated cells of sparse
+    columns.
+    '''
+    df = df.copy()
+    for column in df.columns:
+        df[column] = _sparsify_column(df[column], threshold)
+    return df
+
+
+def _sparsify_column(values, threshold):
+    dtype = values.dtype
+    if not isinstance(dtype, np.dtype) or dtype.kind not in 'fO' or not len(values):
+        return values
+    if values.notna().mean() >= threshold:
+        return values
+    return values.astype(pd.SparseDtype(dtype, np.nan))
+
+
+def _compact_numbers(values):
+    present = values.dropna()
+    if pd.api.types.is_float_dtype(values) and len(present) and \
+            (present == np.round(present)).all() and (present.abs() < 2 ** 53).all():
+        return values.astype('Int64')
+    return values
+
+
+def _parse_datetimes(values):
+    '''Parses ISO 8601 strings. Date-only columns become naive datetime64,
+    columns with times become UTC datetime64.
+    '''
+    present = values.dropna()
+    if len(present) and present.astype(str).str.len().max() <= 10:
+        return pd.to_datetime(values, format='%Y-%m-%d', errors='coerce')
+    try:
+        return pd.to_datetime(values, utc=True, format='ISO8601')
+    except (TypeError, ValueError):  # pandas < 2 or unexpected formats
+        return pd.to_datetime(values, utc=True, errors='coerce')
+
+
+def merge_records_into_DataFrame(df, changed):
+    '''Returns df with the rows of changed (both indexed by record_id) replacing
+    the rows with the same record_id. New records are appended, new fields
+    become new columns.
+    '''
+    new_record_ids = changed.index.difference(df.index, sort=False)
+    merged = pd.concat([df.drop(index=changed.index, errors='ignore'), changed], sort=False)
+    merged = merged.loc[df.index.append(new_record_ids)]
+    merged.index.name = df.index.name
+    return merged
+
+
+def changed_cells(df, pulled):
+    '''Boolean DataFrame shaped like df, True where df differs from pulled.
+    Both are matched by index and column labels. Missing values compare
+    equal to each other. Rows and columns missing from pulled are all True.
+    '''
+    base = pulled.reindex(index=df.index, columns=df.columns)
+    changed = {}
+    for column in df.columns:
+        new, old = df[column], base[column]
+        try:
+            equal = (new == old).fillna(False).to_numpy(dtype=bool)
+        except (TypeError, ValueError):  # e.g. categoricals with other categories
+            equal = np.array([_cells_equal(a, b) for a, b in zip(new, old)], dtype=bool)
+        changed[column] = ~(equal | (new.isna().to_numpy() & old.isna().to_numpy()))
+    changed = pd.DataFrame(changed, index=df.index, columns=df.columns)
+    changed.loc[~df.index.isin(pulled.index)] = True
+    changed.loc[:, ~df.columns.isin(pulled.columns)] = True
+    return changed
+
+
+def _cells_equal(a, b):
+    try:
+        return bool(a == b)
+    except (TypeError, ValueError):
+        return False
+
+
+def _normalize_cells(df):
+    '''Returns df with every cell replaced by a canonical JSON string, so that
+    a value compares equal to the same value as returned by Airtable.
+    '''
+    return pd.DataFrame({column: df[column].map(_normalize_cell) for column in df.columns},
+                        index=df.index, columns=df.columns)
+
+
+def _normalize_cell(value):
+    # Airtable omits empty fields: unchecked checkboxes, empty text and lists
+    if isinstance(value, (bool, np.bool_)):
+        return 'true' if value else 'null'
+    if isinstance(value, (list, tuple, np.ndarray)):
+        value = list(value)
+        if not value:
+            return 'null'
+    elif isinstance(value, dict):
+        pass
+    elif _is_missing(value) or (isinstance(value, str) and value == ''):
+        return 'null'
+    elif isinstance(value, (int, float, np.integer, np.floating)):
+        value = float(value)
+        if value.is_integer():
+            value = int(value)
+    elif isinstance(value, datetime.datetime):
+        if value.tzinfo is None and value.time() == datetime.time():
+            # date-only fields are parsed as naive midnight, Airtable returns YYYY-MM-DD
+            value = value.date().isoformat()
+        else:
+            if value.tzinfo is None:
+                value = value.replace(tzinfo=datetime.timezone.utc)
+            value = _format_timestamp(value)
+    elif isinstance(value, datetime.date):
+        value = value.isoformat()
+    return json.dumps(value, sort_keys=True, default=str)
+
+
+def _format_timestamp(timestamp):
+    '''ISO 8601 UTC string as used by Airtable, e.g. 2020-01-01T00:00:00.000Z'''
+    timestamp = timestamp.astimezone(datetime.timezone.utc)
+    return timestamp.strftime('%Y-%m-%dT%H:%M:%S.') + f'{timestamp.microsecond // 1000:03d}Z'
+
+
+def DataFrame_to_airtable_fields(df):
+    '''Converts a DataFrame into a list of JSON-safe field dicts, one per row.
+    Conversion happens column-wise on the whole frame (see typecast_column).
+    Missing values become None, except in sparse columns, where only the
+    populated cells are included.
+    '''
+    is_sparse = [isinstance(dtype, pd.SparseDtype) for dtype in df.dtypes]
+    sparse_columns = df.columns[is_sparse]
+    dense_columns = df.columns[[not sparse for sparse in is_sparse]]
+    columns = [typecast_column(df.iloc[:, position])
+               for position in np.flatnonzero(np.logical_not(is_sparse))]
+    records = [dict(zip(dense_columns, row)) for row in zip(*columns)]
+    if not columns:
+        records = [{} for _ in range(len(df))]
+    for column in sparse_columns:
+        array = df[column].array
+        values = typecast_column(pd.Series(array.sp_values))
+        for position, value in zip(array.sp_index.indices, values):
+            if value is not None:
+                records[position][column] = value
+    return records
+
+
+def Series_to_airtable_fields(data):
+    '''Converts a Series, e.g. a row of a DataFrame, into a JSON-safe field dict'''
+    return dict(zip(data.index, typecast_column(data)))
+
+
+def typecast_column(series):
+    '''Converts a Series to an object array of JSON-safe values, with one
+    vectorized rule per dtype:
+
+    integers, floats, booleans -- Python int / float / bool, NaN and inf -> None
+    nullable (Int64, boolean, string...) -- Python values, NA -> None
+    datetime64 -- ISO 8601 UTC strings, naive timestamps are taken as UTC
+    timedelta64 -- seconds, as Airtable duration fields expect
+    category -- the categories are converted once and taken by code
+    sparse -- converted dense
+    object and anything else -- typecast_airtable_value per cell
+    '''
+    dtype = series.dtype
+    if isinstance(dtype, pd.SparseDtype):
+        return typecast_column(series.sparse.to_dense())
+    if isinstance(dtype, pd.CategoricalDtype):
+        categories = typecast_column(pd.Series(dtype.categories))
+        values = np.append(categories, None)  # code -1 takes the last element
+        return values[series.cat.codes.to_numpy()]
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        timestamps = series.dt.tz_localize('UTC') if series.dt.tz is None \
+            else series.dt.tz_convert('UTC')
+        strings = timestamps.dt.strftime('%Y-%m-%dT%H:%M:%S.%f').str[:-3] + 'Z'
+        return strings.to_numpy(dtype=object, na_value=None)
+    if pd.api.types.is_timedelta64_dtype(dtype):
+        return typecast_column(series.dt.total_seconds())
+    if isinstance(dtype, np.dtype) and dtype.kind in 'biuf':
+        values = series.to_numpy(dtype=object)
+        if dtype.kind == 'f':
+            values[~np.isfinite(series.to_numpy())] = None
+        return values
+    if isinstance(dtype, pd.StringDtype) or (
+            isinstance(dtype, pd.api.extensions.ExtensionDtype) and dtype.kind in 'biuf'):
+        values = series.to_numpy(dtype=object, na_value=None)
+        if dtype.kind == 'f':
+            finite = np.isfinite(series.to_numpy(dtype=float, na_value=np.nan))
+            values[~finite] = None
+        return values
+    return np.array([typecast_airtable_value(value) for value in series],
+                    dtype=object)
+
+
+def lookup_record_ids(airtable, field_name, field_values):
+    '''Returns the record_id matching each of field_values (None when there is
+    no single match), with batched lookups. Uses the record_id index of a
+    PandasAirtable when field_name is its primary key.
+    '''
+    values = [value for value in field_values if not _is_missing(value)]
+    if isinstance(airtable, PandasAirtable):
+        record_ids = airtable.get_record_ids(field_name, values)
+    else:
+        matches = match_record_ids(airtable, field_name, values)
+        record_ids = {value: ids[0] if len(ids) == 1 else None
+                      for value, ids in matches.items()}
+    return [None if _is_missing(value) else record_ids.get(value)
+            for value in field_values]
+
+
+def match_record_ids(airtable, field_name, field_values):
+    '''Returns a dict of value -> list of matching record_ids, with batched
+    lookups. Uses the record_id index of a PandasAirtable when field_name is
+    its primary key.
+    '''
+    if isinstance(airtable, PandasAirtable) and airtable._use_record_id_index(field_name):
+        index = airtable.record_id_index
+        return {value: index.get(value) for value in field_values}
+    matches = airtable.search_many(field_name, field_values, fields=[field_name])
+    return {value: [r['id'] for r in recs] for value, recs in matches.items()}
+
+
+def _bulk_upsert(airtable, df, key, overwrite=True, typecast=True, robust=True,
+                 max_workers=None):
+    '''See PandasAirtable.bulk_upsert. Works with any Airtable'''
+    matches = match_record_ids(airtable, key, df[key].dropna().unique().tolist())
+    n_duplicated = sum(len(ids) > 1 for ids in matches.values())
+    if n_duplicated:
+        print(f'WARNING: {n_duplicated} keys match more than one record, '
+              'the first match is used')
+    matched = [(value, ids[0]) for value, ids in matches.items() if ids]
+    remote = pd.DataFrame({
+        key: pd.Series([value for value, _ in matched], dtype=df[key].dtype),
+        'record_id': pd.Series([record_id for _, record_id in matched], dtype=object),
+    })
+    merged = df[[key]].reset_index(drop=True).merge(
+        remote, on=key, how='left', sort=False, validate='many_to_one')
+
+    record_ids = merged['record_id'].to_numpy(dtype=object)
+    is_update = merged['record_id'].notna().to_numpy()
+    actions = np.where(is_update, 'update' if overwrite else 'skipped', 'insert').astype(object)
+    errors = np.full(len(df), None, dtype=object)
+    fields = DataFrame_to_airtable_fields(df)
+
+    def send(positions, batch, fallback, items):
+        def rejected(item, exc):
+            if fallback is None:
+                return None, _error_message(exc)
+            try:
+                return fallback(item), None
+            except requests.exceptions.RequestException as exc:
+                return None, _error_message(exc)
+
+        def write(chunk):
+            try:
+                return bisect_batch(
+                    lambda items: [(record, None) for record in batch(items)],
+                    chunk, rejected)
+            except requests.exceptions.RequestException as exc:
+                return [(None, _error_message(exc))] * len(chunk)
+        results = airtable._send_chunks(write, items, max_workers=max_workers)
+        for position, (record, error) in zip(positions, results):
+            failed_fields = getattr(record, 'failed_fields', None)
+            if failed_fields:
+                error = 'failed fields: ' + ', '.join(failed_fields)
+            if record is None or 'id' not in record:
+                actions[position] = 'error'
+            else:
+                record_ids[position] = record['id']
+            errors[position] = error
+
+    inserts = np.flatnonzero(~is_update)
+    send(
+        inserts,
+        lambda chunk: airtable.batch_insert(chunk, typecast=typecast),
+        (lambda f: robust_insert_record(airtable, f, typecast=typecast))
+        if robust else None,
+        [fields[i] for i in inserts],
+    )
+    if overwrite:
+        updates = np.flatnonzero(is_update)
+        send(
+            updates,
+            lambda chunk: airtable.batch_update(chunk, typecast=typecast),
+            (lambda item: robust_update_record(
+                airtable, item['id'], item['fields'], typecast=typecast))
+            if robust else None,
+            [{'id': record_ids[i], 'fields': fields[i]} for i in updates],
+        )
+    return pd.DataFrame(
+        {'record_id': record_ids, 'action': actions, 'error': errors},
+        index=df.index)
+
+
+def robust_insert_record(airtable, fields, typecast=True):
+    '''Inserts a record with any Airtable. If the API rejects some of the
+    values, the fields are bisected to write all the others (see
+    bisect_insert_record). Returns a WriteReport.
+    '''
+    fields = typecast_airtable_value(dict(fields))
+    insert, _ = _unbuffered_writes(airtable)
+    try:
+        return WriteReport(insert(fields, typecast=typecast))
+    except requests.exceptions.HTTPError as exc:
+        if not _is_rejected(exc):
+            raise
+        return bisect_insert_record(airtable, fields, typecast=typecast, rejected=exc)
+
+
+def robust_update_record(airtable, record_id, fields, typecast=True):
+    '''Updates a record with any Airtable, bisecting the fields if the API
+    rejects some of the values (see bisect_update_record). Returns a WriteReport.
+    '''
+    fields = typecast_airtable_value(dict(fields))
+    _, update = _unbuffered_writes(airtable)
+    try:
+        return WriteReport(update(record_id, fields, typecast=typecast))
+    except requests.exceptions.HTTPError as exc:
+        if not _is_rejected(exc):
+            raise
+        return bisect_update_record(airtable, record_id, fields, typecast=typecast,
+                                    rejected=exc)
+
+
+def bisect_insert_record(airtable, fields, typecast=True, rejected=False):
+    '''Inserts a record with as many of fields as the API accepts. Rejected
+    field sets are halved until the bad fields are isolated, so k bad
+    fields out of n cost about k*log2(n) requests instead of n.
+    The record is created with the first accepted half and the remaining
+    fields are written with bisect_update_record. Nothing is inserted if no
+    field is accepted.
+
+    rejected -- True, or the HTTPError, if fields are already known to be
+        rejected as a whole
+
+    Returns a WriteReport, without an id if no field could be written.
+    '''
+    report = WriteReport()
+    _bisect_insert(airtable, list(fields.items()), typecast, report, rejected)
+    return report
+
+
+def _bisect_insert(airtable, items, typecast, report, rejected=False):
+    '''Returns the record_id of the inserted record, or None'''
+    if not items:
+        return None
+    if not rejected:
+        insert, _ = _unbuffered_writes(airtable)
+        try:
+            report.update(insert(dict(items), typecast=typecast))
+            return report['id']
+        except requests.exceptions.HTTPError as exc:
+            if not _is_rejected(exc):
+                raise
+            rejected = exc
+    if len(items) == 1:
+        report.failures.append(WriteFailure(dict(items), _rejection_message(rejected)))
+        return None
+    middle = len(items) // 2
+    record_id = _bisect_insert(airtable, items[:middle], typecast, report)
+    if record_id is None:
+        return _bisect_insert(airtable, items[middle:], typecast, report)
+    _bisect_update(airtable, record_id, items[middle:], typecast, report)
+    return record_id
+
+
+def bisect_update_record(airtable, record_id, fields, typecast=True, rejected=False):
+    '''Updates a record with as many of fields as the API accepts, halving
+    rejected field sets until the bad fields are isolated (see
+    bisect_insert_record). Returns a WriteReport.
+    '''
+    report = WriteReport()
+    _bisect_update(airtable, record_id, list(fields.items()), typecast, report,
+                   rejected)
+    return report
+
+
+def _bisect_update(airtable, record_id, items, typecast, report, rejected=False):
+    if not items:
+        return
+    if not rejected:
+        _, update = _unbuffered_writes(airtable)
+        try:
+            report.update(update(record_id, dict(items), typecast=typecast))
+            return
+        except requests.exceptions.HTTPError as exc:
+            if not _is_rejected(exc):
+                raise
+            rejected = exc
+    if len(items) == 1:
+        report.failures.append(WriteFailure(dict(items), _rejection_message(rejected)))
+        return
+    middle = len(items) // 2
+    _bisect_update(airtable, record_id, items[:middle], typecast, report)
+    _bisect_update(airtable, record_id, items[middle:], typecast, report)
+
+
+def _unbuffered_writes(airtable):
+    '''insert and update functions of airtable that send right away, also
+    inside PandasAirtable.buffered
+    '''
+    return (getattr(airtable, '_insert_now', airtable.insert),
+            getattr(airtable, '_update_now', airtable.update))
+
+
+def _rejection_message(rejected):
+    if isinstance(rejected, Exception):
+        return _error_message(rejected)
+    return 'rejected'
+
+
+def bisect_batch(send, items, rejected):
+    '''Sends items with send, a batch endpoint taking a list. If the API rejects
+    the batch, it is split in halves, recursively, so one bad record in a
+    batch of 10 is isolated in about 2*log2(10) requests and the others are
+    written. A single rejected item is passed with the exception to
+    rejected(item, exc), whose return value is used as its result.
+    Returns the results in item order.
+    '''
+    try:
+        return list(send(items))
+    except requests.exceptions.HTTPError as exc:
+        if not _is_rejected(exc):
+            raise
+        if len(items) == 1:
+            return [rejected(items[0], exc)]
+    middle = len(items) // 2
+    return (bisect_batch(send, items[:middle], rejected)
+            + bisect_batch(send, items[middle:], rejected))
+
+
+def _is_rejected(exc):
+    '''True if the API rejected the request content (invalid values, unknown
+    fields...), as opposed to rate limits, auth, or server errors
+    '''
+    response = getattr(exc, 'response', None)
+    return response is not None and response.status_code in (400, 422)
+
+
+def _error_message(exc):
+    # Airtable._process_response raises HTTPError(message, message with details)
+    return str(exc.args[-1]) if exc.args else repr(exc)
+
+
+def _is_missing(value):
+    return not isinstance(value, (list, dict)) and pd.isna(value)
+
+
+def _looks_like_record_id(value):
+    return isinstance(value, str) and len(value) == 17 and value.startswith('rec')
     
 def create_s3_client(region_name='us-west-1'):
     '''Creates an s3 client. Relies on configured AWS cli i.e. credentials
@@ -690,14 +2165,30 @@ def upload_attachment_to_airtable_via_s3(
             )
 
 def typecast_airtable_value(value):
-    if isinstance(value, list):
-        return value
-    elif isinstance(value, np.int64):
+    '''Converts a single value to a JSON-safe one. Whole columns should go
+    through typecast_column instead.
+    '''
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [typecast_airtable_value(v) for v in value]
+    elif isinstance(value, dict):
+        return {k: typecast_airtable_value(v) for k, v in value.items()}
+    elif isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    elif isinstance(value, np.integer):
         return int(value)
-    # elif value is None:
-    #     return ''
-    elif pd.isna(value):
+    elif isinstance(value, (float, np.floating)):
+        return float(value) if np.isfinite(value) else None
+    elif _is_missing(value):
         return None
+    elif isinstance(value, (datetime.datetime, np.datetime64)):
+        timestamp = pd.Timestamp(value)
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.tz_localize('UTC')
+        return _format_timestamp(timestamp)
+    elif isinstance(value, datetime.date):
+        return value.isoformat()
+    elif isinstance(value, (datetime.timedelta, np.timedelta64)):
+        return pd.Timedelta(value).total_seconds()
     else:
         return value
 
@@ -717,9 +2208,22 @@ def upload_df_to_airtable(
         primary_key (str): primary key on airtable (first column). Defaults to 'id'.
         overwrite (bool): if yes, this runs an upsert. Defaults to False.
         try_one_field_at_a_time (bool, optional): can sometimes solve problems. Defaults to False.
+
+    Returns:
+        DataFrame of per-row outcomes, see PandasAirtable.bulk_upsert
     """        
-    for i, row in df.iterrows():
-        upload_Series_to_airtable(airtable, row, primary_key, overwrite, try_one_field_at_a_time)
+    outcome = _bulk_upsert(airtable, df, primary_key, overwrite=overwrite,
+                           robust=try_one_field_at_a_time)
+    n_skipped = (outcome['action'] == 'skipped').sum()
+    if n_skipped:
+        print(f'''
+            Warning: {n_skipped} rows are already present in airtable
+            Set overwrite=True if you want to overwrite
+            ''')
+    n_failed = (outcome['action'] == 'error').sum()
+    if n_failed:
+        print(f'Upload to Airtable failed for {n_failed} rows')
+    return outcome
 
 
 
@@ -739,12 +2243,7 @@ def upload_Series_to_airtable(
         try_one_field_at_a_time (bool, optional): can sometimes solve problems. Defaults to False.
     """        
     
-    fields = data.to_dict()
-    clean_fields = {}
-    for key, value in fields.items():  # airtable doesnt like numpy ints
-            clean_fields[key] = typecast_airtable_value(value)   
-
-    fields = clean_fields
+    fields = Series_to_airtable_fields(data)
     matching_recs = airtable.search(
     field_name=primary_key, field_value=fields[primary_key])
     failed_to_upload = False
@@ -91,13 +91,91 @@ similar to this:
 """  #
 
 import requests
-from collections import OrderedDict
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 import posixpath
-import time
-from urllib.parse import quote
+import queue
+import threading
+from urllib.parse import quote, quote_plus, urlencode
 
 from .auth import AirtableAuth
+from .cache import ResponseCache, SingleFlight
 from .params import AirtableParams
+from .ratelimit import get_rate_limiter
+from .retry import RetryPolicy
+
+
+BatchFailure = namedtuple("BatchFailure", ["start", "items", "exception"])
+BatchFailure.__doc__ = """
+Chunk of a batch request that failed.
+``start`` is the position of the chunk's first item in the input list.
+"""
+
+
+class BatchError(Exception):
+    """
+    Raised by batch methods sent with ``max_workers`` when some chunks fail.
+    Every chunk is attempted before raising.
+
+    Attributes:
+        records (``list``): Results aligned with the input items.
+            Items of failed chunks are ``None``.
+        failures (``list``): One :any:`BatchFailure` per failed chunk,
+            in input order.
+    """
+
+    def __init__(self, records, failures):
+        self.records = records
+        self.failures = failures
+        message = "{} chunk(s) failed, first error: {}".format(
+            len(failures), failures[0].exception
+        )
+        super().__init__(message)
+
+
+def _prefetch(iterator, depth):
+    """
+    Consumes ``iterator`` on a background thread, keeping up to ``depth``
+    items ready ahead of the caller. Exceptions are re-raised in the caller.
+    """
+    items = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    done = object()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in iterator:
+                if not put((item, None)):
+                    break
+            else:
+                put((done, None))
+        except Exception as exc:
+            put((done, exc))
+        finally:
+            if hasattr(iterator, "close"):
+                iterator.close()
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, exc = items.get()
+            if item is done:
+                if exc is not None:
+                    raise exc
+                return
+            yield item
+    finally:
+        stop.set()
 
 
 class Airtable(object):
@@ -107,8 +185,19 @@ class Airtable(object):
     API_LIMIT = 1.0 / 5  # 5 per second
     API_URL = posixpath.join(API_BASE_URL, VERSION)
     MAX_RECORDS_PER_REQUEST = 10
-
-    def __init__(self, base_key, table_name, api_key, timeout=None):
+    MAX_URL_LENGTH = 16000
+    single_flight = SingleFlight()
+
+    def __init__(
+        self,
+        base_key,
+        table_name,
+        api_key,
+        timeout=None,
+        rate_limiter=None,
+        retry=None,
+        cache=None,
+    ):
         """
         Instantiates a new Airtable instance
 
@@ -128,15 +217,36 @@ class Airtable(object):
             timeout (``int``, ``Tuple[int, int]``, optional): Optional timeout
                 parameters to be used in request. `See requests timeout docs.
                 <https://requests.readthedocs.io/en/master/user/advanced/#timeouts>`_
+            rate_limiter (``TokenBucket``, optional): Limiter consulted before
+                each request. Defaults to the limiter shared by all tables of
+                ``base_key``, running at ``1 / API_LIMIT`` requests per second.
+                See :any:`get_rate_limiter`.
+            retry (``RetryPolicy``, optional): Policy used to retry rate
+                limited requests, server errors and connection errors.
+                Defaults to ``RetryPolicy()``. See :any:`RetryPolicy`.
+            cache (``ResponseCache``, optional): Cache of ``GET`` responses,
+                which can be shared by several tables. ``True`` creates a
+                ``ResponseCache()`` for this table. Default is no cache.
+                See :any:`ResponseCache`.
 
         """
         session = requests.Session()
         session.auth = AirtableAuth(api_key=api_key)
         self.session = session
+        self.base_key = base_key
         self.table_name = table_name
         url_safe_table_name = quote(table_name, safe="")
         self.url_table = posixpath.join(self.API_URL, base_key, url_safe_table_name)
         self.timeout = timeout
+        if rate_limiter is None:
+            rate_limiter = get_rate_limiter(base_key, rate=1.0 / self.API_LIMIT)
+        self.rate_limiter = rate_limiter
+        if retry is None:
+            retry = RetryPolicy()
+        self.retry = retry
+        if cache is True:
+            cache = ResponseCache()
+        self.cache = cache
 
     def _process_params(self, params):
         """
@@ -157,6 +267,61 @@ class Airtable(object):
     def _build_batch_record_objects(self, records):
         return [{"fields": record} for record in records]
 
+    def _chunk_formulas(self, formulas, **options):
+        """
+        Groups ``formulas`` into ``OR(...)`` formulas, each short enough to
+        keep the request url under ``MAX_URL_LENGTH`` together with the
+        other ``options`` and a pagination offset.
+        """
+        any_of = AirtableParams.FormulaParam.any_of
+        fixed = len(self.url_table) + len("?filterByFormula=OR()&offset=") + 64
+        fixed += len(urlencode(self._process_params(options), doseq=True))
+        budget = self.MAX_URL_LENGTH - fixed
+        chunk, length = [], 0
+        for formula in formulas:
+            size = len(quote_plus(formula)) + len(quote_plus(","))
+            if chunk and length + size > budget:
+                yield any_of(chunk)
+                chunk, length = [], 0
+            chunk.append(formula)
+            length += size
+        if chunk:
+            yield any_of(chunk)
+
+    def _send_chunks(self, send, items, max_workers=None):
+        """
+        Breaks ``items`` into chunks of ``MAX_RECORDS_PER_REQUEST`` and calls
+        ``send`` on each one, which must return a list of records.
+        Returns all records in input order.
+
+        With ``max_workers``, chunks are sent from a thread pool, still
+        throttled by the rate limiter, and failures are reported together
+        in a :any:`BatchError`.
+        """
+        chunks = list(self._chunk(items, self.MAX_RECORDS_PER_REQUEST))
+        if not max_workers or max_workers <= 1 or len(chunks) <= 1:
+            records = []
+            for chunk in chunks:
+                records += send(chunk)
+            return records
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(send, chunk) for chunk in chunks]
+
+        records, failures = [], []
+        start = 0
+        for chunk, future in zip(chunks, futures):
+            exception = future.exception()
+            if exception is None:
+                records += future.result()
+            else:
+                records += [None] * len(chunk)
+                failures.append(BatchFailure(start, chunk, exception))
+            start += len(chunk)
+        if failures:
+            raise BatchError(records, failures)
+        return records
+
     def _process_response(self, response):
         try:
             response.raise_for_status()
@@ -181,14 +346,60 @@ class Airtable(object):
         return posixpath.join(self.url_table, record_id)
 
     def _request(self, method, url, params=None, json_data=None):
-        response = self.session.request(
-            method, url, params=params, json=json_data, timeout=self.timeout
-        )
-        return self._process_response(response)
+        if method == "get" and self.single_flight is not None:
+            # a GET never joins one that started before the last write to the
+            # table, so a thread reads its own writes
+            key = (
+                ResponseCache.key(url, params, self.session.auth.api_key),
+                self.single_flight.generation(self.url_table),
+            )
+            return self.single_flight.do(
+                key, lambda: self._send_request(method, url, params, json_data)
+            )
+        if method == "get":
+            return self._send_request(method, url, params, json_data)
+        try:
+            return self._send_request(method, url, params, json_data)
+        finally:
+            if self.single_flight is not None:
+                self.single_flight.bump(self.url_table)
+            if self.cache is not None:
+                self.cache.invalidate(self.url_table)
+
+    def _send_request(self, method, url, params=None, json_data=None):
+        attempt = 0
+        while True:
+            self.rate_limiter.acquire()
+            try:
+                response = self.session.request(
+                    method, url, params=params, json=json_data, timeout=self.timeout
+                )
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if not self.retry.is_retryable(method, attempt):
+                    raise
+                response = None
+            else:
+                if self.retry.adaptive:
+                    if response.status_code == 429:
+                        self.rate_limiter.decrease()
+                    elif response.ok:
+                        self.rate_limiter.increase()
+                if not self.retry.is_retryable(method, attempt, response):
+                    return self._process_response(response)
+            self.retry.sleep(attempt, response)
+            attempt += 1
 
     def _get(self, url, **params):
         processed_params = self._process_params(params)
-        return self._request("get", url, params=processed_params)
+        if self.cache is None:
+            return self._request("get", url, params=processed_params)
+        key = self.cache.key(url, processed_params, self.session.auth.api_key)
+        response = self.cache.get(key)
+        if response is None:
+            version = self.cache.version
+            response = self._request("get", url, params=processed_params)
+            self.cache.set(key, response, version=version)
+        return response
 
     def _post(self, url, json_data):
         return self._request("post", url, json_data=json_data)
@@ -223,7 +434,46 @@ class Airtable(object):
         record_url = self.record_url(record_id)
         return self._get(record_url)
 
-    def get_iter(self, **options):
+    def get_many(self, record_ids, return_missing=False, **options):
+        """
+        Retrieves several records by their ids.
+
+        Ids are packed into ``OR(RECORD_ID()='rec...', ...)`` formulas,
+        each kept under the url length limit, so a few hundred records
+        are fetched per request instead of one.
+
+        >>> airtable.get_many(['recwPQIfs4wKPyc9D', 'recwDxIfs3wDPyc3F'])
+        [{'id': 'recwPQIfs4wKPyc9D', 'fields': ... }, ...]
+
+        Args:
+            record_ids(``list``): Airtable record ids
+            return_missing(``bool``, optional): If True, also return the list
+                of ids that were not found. Default is False.
+
+        Keyword Args:
+            view (``str``, optional): The name or ID of a view.
+                See :any:`ViewParam`.
+            fields (``str``, ``list``, optional): Name of field or fields to
+                be retrieved. Default is all fields. See :any:`FieldsParam`.
+
+        Returns:
+            records (``list``): Records found, in the order of ``record_ids``.
+            If ``return_missing`` is True, a ``(records, missing_ids)`` tuple.
+        """
+        from_record_id = AirtableParams.FormulaParam.from_record_id
+        unique_ids = list(OrderedDict.fromkeys(record_ids))
+        formulas = [from_record_id(record_id) for record_id in unique_ids]
+        found = {}
+        for formula in self._chunk_formulas(formulas, **options):
+            for record in self.get_all(formula=formula, **options):
+                found[record["id"]] = record
+        records = [found[record_id] for record_id in record_ids if record_id in found]
+        if return_missing:
+            missing = [record_id for record_id in unique_ids if record_id not in found]
+            return records, missing
+        return records
+
+    def get_iter(self, prefetch=0, **options):
         """
         Record Retriever Iterator
 
@@ -235,8 +485,25 @@ class Airtable(object):
         ...         print(record)
         [{'fields': ... }, ...]
 
+        Each page is retried from its own offset according to the
+        :any:`RetryPolicy`. If a page still fails, the raised exception has
+        an ``offset`` attribute that can be used to resume iteration:
+
+        >>> airtable.get_iter(offset=exc.offset)
+
+        With ``prefetch``, pages are fetched on a background thread while the
+        caller processes the previous ones. Each request still waits for the
+        previous page's offset, but the network time overlaps with the
+        caller's work:
+
+        >>> for page in airtable.get_iter(prefetch=2):
+        ...     expensive_processing(page)
+
 
     Keyword Args:
+            prefetch (``int``, optional): Number of pages to fetch ahead on a
+                background thread. Default is 0, which fetches each page
+                only when it is requested.
             max_records (``int``, optional): The maximum total number of
                 records that will be returned. See :any:`MaxRecordsParam`
             view (``str``, optional): The name or ID of a view.
@@ -250,16 +517,26 @@ class Airtable(object):
                 Default order is ascending. See :any:`SortParam`.
             formula (``str``, optional): Airtable formula.
                 See :any:`FormulaParam`.
+            offset (``str``, optional): Offset of the first page to retrieve.
 
         Returns:
             iterator (``list``): List of Records, grouped by pageSize
 
         """
-        offset = None
+        pages = self._iter_pages(**options)
+        if prefetch:
+            pages = _prefetch(pages, prefetch)
+        return pages
+
+    def _iter_pages(self, **options):
+        offset = options.pop("offset", None)
         while True:
-            data = self._get(self.url_table, offset=offset, **options)
+            try:
+                data = self._get(self.url_table, offset=offset, **options)
+            except requests.exceptions.RequestException as exc:
+                exc.offset = offset
+                raise
             records = data.get("records", [])
-            time.sleep(self.API_LIMIT)
             yield records
             offset = data.get("offset")
             if not offset:
@@ -269,6 +546,10 @@ class Airtable(object):
         """
         Retrieves all records repetitively and returns a single list.
 
+        If a page fails after retries, the raised exception also has a
+        ``records`` attribute with the records fetched so far, and an
+        ``offset`` attribute to resume from (see :any:`get_iter`).
+
         >>> airtable.get_all()
         >>> airtable.get_all(view='MyView', fields=['ColA', '-ColB'])
         >>> airtable.get_all(maxRecords=50)
@@ -294,8 +575,12 @@ class Airtable(object):
 
         """
         all_records = []
-        for records in self.get_iter(**options):
-            all_records.extend(records)
+        try:
+            for records in self.get_iter(**options):
+                all_records.extend(records)
+        except requests.exceptions.RequestException as exc:
+            exc.records = all_records
+            raise
         return all_records
 
     def match(self, field_name, field_value, **options):
@@ -365,6 +650,52 @@ class Airtable(object):
         records = self.get_all(**options)
         return records
 
+    def search_many(self, field_name, field_values, **options):
+        """
+        Looks up many values of one field with as few requests as possible.
+
+        The ``{field}=value`` formulas of :any:`search` are packed into
+        ``OR(...)`` formulas, each kept under the url length limit.
+
+        >>> airtable.search_many('Name', ['John', 'Marc', 'Nobody'])
+        {'John': [{'fields': {'Name': 'John', ...}}], 'Marc': [...], 'Nobody': []}
+
+        Args:
+            field_name (``str``): Name of field to match (column name).
+            field_values (``list``): Values of field to match.
+
+        Keyword Args:
+            view (``str``, optional): The name or ID of a view.
+                See :any:`ViewParam`.
+            fields (``str``, ``list``, optional): Name of field or fields to
+                be retrieved. ``field_name`` is always included.
+                See :any:`FieldsParam`.
+
+        Returns:
+            matches (``dict``): Records matching each value, keyed by value,
+            in the order of ``field_values``. Values without a match map to
+            an empty list.
+        """
+        from_name_and_value = AirtableParams.FormulaParam.from_name_and_value
+        matches = OrderedDict((value, []) for value in field_values)
+        fields = options.get("fields")
+        if fields is not None:
+            fields = [fields] if isinstance(fields, str) else list(fields)
+            if field_name not in fields:
+                options["fields"] = fields + [field_name]
+        formulas = [from_name_and_value(field_name, value) for value in matches]
+        for formula in self._chunk_formulas(formulas, **options):
+            for record in self.get_all(formula=formula, **options):
+                value = record.get("fields", {}).get(field_name)
+                for candidate in value if isinstance(value, list) else [value]:
+                    try:
+                        records = matches.get(candidate)
+                    except TypeError:  # unhashable cell value
+                        continue
+                    if records is not None:
+                        records.append(record)
+        return matches
+
     def insert(self, fields, typecast=False):
         """
         Inserts a record
@@ -385,32 +716,39 @@ class Airtable(object):
             self.url_table, json_data={"fields": fields, "typecast": typecast}
         )
 
-    def batch_insert(self, records, typecast=False):
+    def batch_insert(self, records, typecast=False, max_workers=None):
         """
         Breaks records into chunks of 10 and inserts them in batches.
-        Follows the set API rate.
-        To change the rate limit use ``airtable.API_LIMIT = 0.2``
-        (5 per second)
+        Requests are throttled by the base's shared rate limiter
+        (5 per second by default, see :any:`get_rate_limiter`).
 
         >>> records = [{'Name': 'John'}, {'Name': 'Marc'}]
         >>> airtable.batch_insert(records)
 
+        Chunks can be sent concurrently, which saves the round-trip time
+        between chunks on high-latency links:
+
+        >>> airtable.batch_insert(records, max_workers=5)
+
         Args:
             records(``list``): Records to insert
             typecast(``boolean``): Automatic data conversion from string values.
+            max_workers(``int``, optional): Number of chunks sent concurrently.
+                Records are still returned in input order. If some chunks
+                fail, :any:`BatchError` is raised after all chunks were sent.
 
         Returns:
             records (``list``): list of added records
         """
-        inserted_records = []
-        for chunk in self._chunk(records, self.MAX_RECORDS_PER_REQUEST):
+
+        def send(chunk):
             new_records = self._build_batch_record_objects(chunk)
             response = self._post(
                 self.url_table, json_data={"records": new_records, "typecast": typecast}
             )
-            inserted_records += response["records"]
-            time.sleep(self.API_LIMIT)
-        return inserted_records
+            return response["records"]
+
+        return self._send_chunks(send, records, max_workers=max_workers)
 
     def update(self, record_id, fields, typecast=False):
         """
@@ -435,26 +773,28 @@ class Airtable(object):
             record_url, json_data={"fields": fields, "typecast": typecast}
         )
 
-    def batch_update(self, records, typecast=False):
+    def batch_update(self, records, typecast=False, max_workers=None):
         """
         Updates a records by their record id's in batch.
 
         Args:
             records(``list``): List of dict: [{"id": record_id, "field": fields_to_update_dict}]
             typecast(``boolean``): Automatic data conversion from string values.
+            max_workers(``int``, optional): Number of chunks sent concurrently.
+                See :any:`batch_insert`.
 
         Returns:
             records(``list``): list of updated records
         """
-        updated_records = []
-        for chunk in self._chunk(records, self.MAX_RECORDS_PER_REQUEST):
+
+        def send(chunk):
             chunk_records = [{"id": x["id"], "fields": x["fields"]} for x in chunk]
             response = self._patch(
                 self.url_table, json_data={"records": chunk_records, "typecast": typecast}
             )
-            updated_records += response["records"]
-        #
-        return updated_records
+            return response["records"]
+
+        return self._send_chunks(send, records, max_workers=max_workers)
 
     def update_by_field(
         self, field_name, field_value, fields, typecast=False, **options
@@ -576,30 +916,30 @@ class Airtable(object):
         record_url = self.record_url(record["id"])
         return self._delete(record_url)
 
-    def batch_delete(self, record_ids):
+    def batch_delete(self, record_ids, max_workers=None):
         """
-        Breaks records into batches of 10 and deletes in batches, following set
-        API Rate Limit (5/sec).
-        To change the rate limit set value of ``airtable.API_LIMIT`` to
-        the time in seconds it should sleep before calling the function again.
+        Breaks records into batches of 10 and deletes in batches.
+        Requests are throttled by the base's shared rate limiter
+        (5 per second by default, see :any:`get_rate_limiter`).
 
         >>> record_ids = ['recwPQIfs4wKPyc9D', 'recwDxIfs3wDPyc3F']
         >>> airtable.batch_delete(records_ids)
 
         Args:
             records(``list``): Record Ids to delete
+            max_workers(``int``, optional): Number of chunks sent concurrently.
+                See :any:`batch_insert`.
 
         Returns:
             records(``list``): list of records deleted
 
         """
-        chunks = self._chunk(record_ids, self.MAX_RECORDS_PER_REQUEST)
-        deleted_records = []
-        for chunk in chunks:
+
+        def send(chunk):
             response = self._delete_batch(chunk)
-            deleted_records += response["records"] if len(chunk) > 1 else [response]
-            time.sleep(self.API_LIMIT)
-        return deleted_records
+            return response["records"] if len(chunk) > 1 else [response]
+
+        return self._send_chunks(send, record_ids, max_workers=max_workers)
 
     def __repr__(self):
         return "<Airtable table:{}>".format(self.table_name)
@@ -0,0 +1,178 @@
+"""
+Records can be converted straight to Arrow, without going through a pandas
+DataFrame, for export to Parquet and other Arrow consumers.
+
+Requires ``pyarrow``.
+
+>>> table = airtable.to_arrow(view='ViewName')
+>>> pyarrow.parquet.write_table(table, 'table.parquet')
+
+Or one ``RecordBatch`` per page, in constant memory:
+
+>>> with pyarrow.parquet.ParquetWriter('table.parquet', schema) as writer:
+...     for batch in airtable.to_arrow_iter(schema=schema):
+...         writer.write_batch(batch)
+
+Each page is collected into one value list per field and converted column by
+column. Multiple selects and linked records become list columns, attachments
+lists of structs. Fields missing from a record are null. The first column is
+``record_id``.
+
+Without a ``schema``, the types of each batch are inferred from its values,
+so batches can differ (a field empty on a whole page is missing or has the
+null type). :any:`records_to_arrow` reconciles them by permissive schema
+promotion. Values of mixed types that Arrow cannot store in one column,
+within a page or across pages, are JSON encoded as strings.
+
+"""  #
+
+import json
+
+
+def _import_pyarrow(feature="Arrow conversion"):
+    try:
+        import pyarrow
+        import pyarrow.ipc  # noqa
+    except ImportError:
+        raise ImportError("{} requires pyarrow: pip install pyarrow".format(feature))
+    return pyarrow
+
+
+def records_to_record_batch(records, schema=None):
+    """
+    Converts a list of records to a ``pyarrow.RecordBatch``.
+
+    Args:
+        records (``list``): Airtable records, e.g. a page from
+            :any:`Airtable.get_iter`.
+
+    Keyword Args:
+        schema (``pyarrow.Schema``, optional): Schema of the batch. Fields
+            that are not in the schema are dropped, fields of the schema
+            that are missing from the records are null. The first field
+            should be ``record_id``. Default is to infer the types.
+    """
+    pa = _import_pyarrow()
+    record_ids = []
+    columns = {}  # field name -> values, padded with None
+    for position, record in enumerate(records):
+        record_ids.append(record["id"])
+        for name, value in record["fields"].items():
+            column = columns.setdefault(name, [])
+            if len(column) < position:
+                column.extend([None] * (position - len(column)))
+            column.append(value)
+    for column in columns.values():
+        column.extend([None] * (len(record_ids) - len(column)))
+
+    if schema is None:
+        names = ["record_id"] + list(columns)
+        arrays = [pa.array(record_ids, type=pa.string())]
+        arrays += [_to_array(pa, values) for values in columns.values()]
+        return pa.RecordBatch.from_arrays(arrays, names=names)
+
+    arrays = []
+    for field in schema:
+        if field.name == "record_id":
+            values = record_ids
+        else:
+            values = columns.get(field.name, [None] * len(record_ids))
+        arrays.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def _to_array(pa, values):
+    try:
+        return pa.array(values)
+    except pa.ArrowException:
+        return pa.array(
+            [
+                value if value is None or isinstance(value, str) else json.dumps(value)
+                for value in values
+            ],
+            type=pa.string(),
+        )
+
+
+def iter_record_batches(pages, schema=None):
+    """
+    Yields one ``pyarrow.RecordBatch`` per page of records.
+    See :any:`records_to_record_batch`.
+    """
+    for page in pages:
+        yield records_to_record_batch(page, schema=schema)
+
+
+def records_to_arrow(pages, schema=None):
+    """
+    Converts pages of records to a ``pyarrow.Table``.
+    Batches with different inferred schemas are promoted to a common one.
+    Columns whose types cannot be promoted (e.g. numbers on one page and
+    text on another) are JSON encoded as strings in every batch.
+    See :any:`records_to_record_batch`.
+    """
+    pa = _import_pyarrow()
+    tables = [
+        pa.Table.from_batches([batch])
+        for batch in iter_record_batches(pages, schema=schema)
+    ]
+    if not tables:
+        if schema is None:
+            schema = pa.schema([("record_id", pa.string())])
+        return schema.empty_table()
+    if schema is not None:
+        return pa.concat_tables(tables)
+    conflicting = _conflicting_columns(pa, tables)
+    if conflicting:
+        tables = [_json_encode_columns(pa, table, conflicting) for table in tables]
+    return _concat_promoted(pa, tables)
+
+
+def _permissive_promotion(pa):
+    # promote_options was added in pyarrow 14, replacing promote=True
+    return int(pa.__version__.split(".")[0]) >= 14
+
+
+def _concat_promoted(pa, tables):
+    if _permissive_promotion(pa):
+        return pa.concat_tables(tables, promote_options="permissive")
+    return pa.concat_tables(tables, promote=True)
+
+
+def _unify_types(pa, name, types):
+    schemas = [pa.schema([pa.field(name, type_)]) for type_ in types]
+    if _permissive_promotion(pa):
+        return pa.unify_schemas(schemas, promote_options="permissive")
+    return pa.unify_schemas(schemas)
+
+
+def _conflicting_columns(pa, tables):
+    """Names of the columns whose types differ between tables and cannot be
+    promoted to a common type"""
+    types = {}
+    for table in tables:
+        for field in table.schema:
+            types.setdefault(field.name, set()).add(field.type)
+    conflicting = set()
+    for name, column_types in types.items():
+        if len(column_types) == 1:
+            continue
+        try:
+            _unify_types(pa, name, list(column_types))
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            conflicting.add(name)
+    return conflicting
+
+
+def _json_encode_columns(pa, table, names):
+    for position, field in enumerate(table.schema):
+        if field.name not in names or pa.types.is_string(field.type):
+            continue
+        values = [
+            value if value is None or isinstance(value, str) else json.dumps(value)
+            for value in table.column(position).to_pylist()
+        ]
+        table = table.set_column(
+            position, pa.field(field.name, pa.string()), pa.array(values, pa.string())
+        )
+    return table
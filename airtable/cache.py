@@ -0,0 +1,214 @@
+"""
+Read responses can be kept in an in-process :any:`ResponseCache`, so
+dashboards and repeated notebook runs that issue the same ``get_all``,
+``search``, ``match`` or ``get`` calls do not spend rate limit budget on
+them again.
+
+>>> cache = ResponseCache(ttl=300, max_entries=512)
+>>> airtable = Airtable('base_key', 'table_name', api_key, cache=cache)
+>>> airtable.get_all(view='ViewName')  # sent
+>>> airtable.get_all(view='ViewName')  # from the cache
+>>> cache.stats
+CacheStats(hits=1, misses=1, evictions=0, size=1)
+
+Every ``GET`` sent by :any:`Airtable` is cached, one entry per page, keyed
+on the API key, the url and the processed query parameters. Entries expire
+after ``ttl`` seconds, and the least recently used entry is evicted when
+``max_entries`` is reached.
+
+A write (``POST``, ``PATCH``, ``PUT`` or ``DELETE``) made by an instance
+drops the cached responses of its table. Writes made by other clients are
+only seen once the entries expire.
+
+A cache can be shared by several tables. Values are copied on the way in
+and out, so callers can modify the records they get.
+
+Independently of the cache, identical ``GET`` requests issued at the same
+time by several threads are merged by :any:`SingleFlight`: one request is
+sent and every caller gets a copy of its response, or its exception. A
+request never joins one that started before the last write made to its table
+through any instance, so a thread always reads its own writes. It is shared
+by all :any:`Airtable` instances (``Airtable.single_flight``) and can be
+turned off for an instance:
+
+>>> airtable.single_flight = None
+
+"""  #
+
+import copy
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+CacheStats = namedtuple("CacheStats", ["hits", "misses", "evictions", "size"])
+
+
+class ResponseCache(object):
+    """
+    Thread-safe TTL and LRU cache of API responses.
+
+    Keyword Args:
+        ttl (``float``, optional): Seconds a response stays valid.
+            Default is 60.
+        max_entries (``int``, optional): Maximum number of responses kept.
+            Default is 256.
+        clock (``callable``, optional): Monotonic clock in seconds.
+    """
+
+    def __init__(self, ttl=60, max_entries=256, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries = OrderedDict()  # key -> (expires, response)
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._version = 0  # incremented by each invalidation
+
+    @property
+    def version(self):
+        """
+        Changes whenever responses are invalidated. Read it before sending a
+        request and pass it to :any:`set`, so a response that was in flight
+        during a write is not cached.
+        """
+        return self._version
+
+    @staticmethod
+    def key(url, params=None, api_key=None):
+        """Returns the cache key of a request"""
+        items = []
+        for name, value in (params or {}).items():
+            if isinstance(value, list):
+                value = tuple(value)
+            items.append((name, value))
+        return (api_key, url, tuple(sorted(items)))
+
+    def get(self, key):
+        """Returns a copy of the cached response for ``key``, or ``None``"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= self._clock():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            response = entry[1]
+        return copy.deepcopy(response)
+
+    def set(self, key, response, version=None):
+        """
+        Stores a copy of ``response`` under ``key``, unless ``version`` is
+        given and responses were invalidated since it was read.
+        """
+        response = copy.deepcopy(response)
+        with self._lock:
+            if version is not None and version != self._version:
+                return
+            self._entries[key] = (self._clock() + self.ttl, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate(self, url):
+        """
+        Drops the responses of ``url`` and the urls below it, e.g. all the
+        cached pages and records of a table for its ``url_table``.
+        """
+        prefix = url.rstrip("/") + "/"
+        with self._lock:
+            self._version += 1
+            for key in list(self._entries):
+                if key[1] == url or key[1].startswith(prefix):
+                    del self._entries[key]
+
+    def clear(self):
+        """Drops every response. Statistics are kept"""
+        with self._lock:
+            self._entries.clear()
+
+    @property
+    def stats(self):
+        """:any:`CacheStats` with hits, misses, evictions and current size"""
+        with self._lock:
+            return CacheStats(
+                self._hits, self._misses, self._evictions, len(self._entries)
+            )
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __repr__(self):
+        return "<ResponseCache ttl:{} {}>".format(self.ttl, self.stats)
+
+
+class _Call(object):
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.exception = None
+        self.waiters = 0
+
+
+class SingleFlight(object):
+    """
+    Merges concurrent calls with the same key into one.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._generations = {}  # scope -> number of writes
+        self._lock = threading.Lock()
+
+    def generation(self, scope):
+        """
+        Number of :any:`bump` calls for ``scope`` (e.g. a table url). Part of
+        the key of calls that must not return data older than the last bump.
+        """
+        return self._generations.get(scope, 0)
+
+    def bump(self, scope):
+        """Records a write to ``scope``"""
+        with self._lock:
+            self._generations[scope] = self._generations.get(scope, 0) + 1
+
+    def do(self, key, function):
+        """
+        Returns ``function()``. If a call with the same ``key`` is already
+        running in another thread, waits for it instead and returns a copy of
+        its result, or raises its exception.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+        if not leader:
+            call.done.wait()
+            if call.exception is not None:
+                raise call.exception
+            return copy.deepcopy(call.result)
+        try:
+            call.result = function()
+        except BaseException as exc:
+            call.exception = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                waiters = call.waiters
+            call.done.set()
+        if waiters:
+            return copy.deepcopy(call.result)
+        return call.result
+
+    def __len__(self):
+        """Number of calls running"""
+        return len(self._calls)
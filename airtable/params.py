@@ -210,6 +210,32 @@ class AirtableParams(object):
             formula = "{{{name}}}={value}".format(name=field_name, value=field_value)
             return formula
 
+        @staticmethod
+        def from_record_id(record_id):
+            """
+            Creates a formula to match a record by its id
+            """
+            return "RECORD_ID()='{}'".format(record_id)
+
+        @staticmethod
+        def any_of(formulas):
+            """
+            Combines formulas to match records matching any of them
+            """
+            return "OR({})".format(",".join(formulas))
+
+        @staticmethod
+        def modified_since(timestamp):
+            """
+            Creates a formula to match records created or modified after
+            ``timestamp``, an ISO 8601 string such as
+            ``'2020-01-01T00:00:00.000Z'``
+            """
+            after = "DATETIME_PARSE('{}')".format(timestamp)
+            return "OR(IS_AFTER(LAST_MODIFIED_TIME(),{0}),IS_AFTER(CREATED_TIME(),{0}))".format(
+                after
+            )
+
     class _OffsetParam(_BaseParam):
         """
         Offset Param
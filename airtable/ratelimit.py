@@ -0,0 +1,171 @@
+"""
+Requests are throttled by a token bucket that is shared by every
+:any:`Airtable` instance talking to the same base, so several table objects
+cannot overrun the per-base rate limit together.
+
+The bucket is consulted right before each request is sent. Time spent
+waiting on the network counts towards the budget, so no extra sleeping
+happens after a request and the full rate is available.
+
+>>> limiter = get_rate_limiter('appJMY16gZDQrMWpA')
+>>> limiter.acquire()  # blocks until a token is available
+0.0
+
+To use a different rate for a base, register a limiter before creating
+the tables, or pass one explicitly:
+
+>>> limiter = TokenBucket(rate=2)
+>>> airtable = Airtable('base_key', 'table_name', api_key, rate_limiter=limiter)
+
+The rate adapts to the server (AIMD): with an adaptive :any:`RetryPolicy`,
+requests call :any:`TokenBucket.decrease` after a ``429`` response, which
+halves the rate, and :any:`TokenBucket.increase` after each successful
+request, which adds a small step back until the configured rate is reached.
+
+"""  #
+
+import threading
+import time
+
+
+class TokenBucket(object):
+    """
+    Thread-safe token bucket.
+
+    Tokens are refilled continuously at ``rate`` per second, up to
+    ``capacity``. Callers reserve a token before sending a request. When no
+    token is available the reservation is still taken and the caller is told
+    how long to wait, so concurrent callers are served in order.
+
+    Args:
+        rate (``float``): Tokens added per second.
+
+    Keyword Args:
+        capacity (``int``, optional): Maximum number of tokens that can
+            accumulate while idle, i.e. the allowed burst size. Default is 1.
+        min_rate (``float``, optional): Lower bound for :any:`decrease`.
+            Default is a tenth of ``rate``.
+        decrease_factor (``float``, optional): Factor applied to the rate by
+            :any:`decrease`. Default is 0.5.
+        increase_step (``float``, optional): Rate added by :any:`increase`.
+            Default is a twentieth of ``rate``.
+        clock (``callable``, optional): Monotonic clock returning seconds.
+        sleep (``callable``, optional): Function used to wait.
+    """
+
+    def __init__(
+        self,
+        rate,
+        capacity=1,
+        min_rate=None,
+        decrease_factor=0.5,
+        increase_step=None,
+        clock=time.monotonic,
+        sleep=time.sleep,
+    ):
+        if rate <= 0:
+            raise ValueError("rate must be positive, got {}".format(rate))
+        self.rate = float(rate)
+        self.max_rate = self.rate
+        self.min_rate = self.rate / 10 if min_rate is None else float(min_rate)
+        self.decrease_factor = decrease_factor
+        self.increase_step = self.rate / 20 if increase_step is None else increase_step
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(capacity)
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        elapsed = max(0.0, now - self._last)
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._last = now
+
+    def reserve(self, tokens=1):
+        """
+        Takes ``tokens`` from the bucket without waiting.
+
+        Returns:
+            wait (``float``): Seconds the caller must wait before using the
+            reserved tokens. ``0.0`` if they are available now.
+        """
+        with self._lock:
+            self._refill()
+            self._tokens -= tokens
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self, tokens=1):
+        """
+        Takes ``tokens`` from the bucket, blocking until they are available.
+
+        Returns:
+            wait (``float``): Seconds spent waiting.
+        """
+        wait = self.reserve(tokens)
+        if wait > 0:
+            self._sleep(wait)
+        return wait
+
+    def decrease(self):
+        """
+        Multiplies the rate by ``decrease_factor``, down to ``min_rate``.
+        Called after the server answered ``429 Too Many Requests``.
+        """
+        with self._lock:
+            self._refill()
+            self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+
+    def increase(self):
+        """
+        Adds ``increase_step`` to the rate, up to the configured rate.
+        Called after each successful request.
+        """
+        if self.rate >= self.max_rate:
+            return
+        with self._lock:
+            self._refill()
+            self.rate = min(self.max_rate, self.rate + self.increase_step)
+
+    def __repr__(self):
+        return "<TokenBucket rate:{}/s capacity:{}>".format(self.rate, self.capacity)
+
+
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(base_key, rate=5, capacity=1):
+    """
+    Returns the process-wide :any:`TokenBucket` for a base, creating it with
+    ``rate`` and ``capacity`` on first use.
+
+    Args:
+        base_key(``str``): Airtable base identifier
+
+    Keyword Args:
+        rate (``float``, optional): Requests per second. Default is 5, the
+            Airtable limit per base.
+        capacity (``int``, optional): Allowed burst size. Default is 1.
+
+    Returns:
+        limiter (``TokenBucket``): Limiter shared by all tables in the base.
+    """
+    with _rate_limiters_lock:
+        limiter = _rate_limiters.get(base_key)
+        if limiter is None:
+            limiter = TokenBucket(rate, capacity=capacity)
+            _rate_limiters[base_key] = limiter
+        return limiter
+
+
+def set_rate_limiter(base_key, limiter):
+    """
+    Registers ``limiter`` as the shared limiter for a base.
+    Tables created afterwards for that base will use it.
+    """
+    with _rate_limiters_lock:
+        _rate_limiters[base_key] = limiter
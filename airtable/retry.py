@@ -0,0 +1,144 @@
+"""
+Failed requests are retried by :any:`Airtable` according to a
+:any:`RetryPolicy`.
+
+Rate limited responses (``429``) are always retried, since Airtable rejected
+them without processing. Server errors (``5xx``) and connection errors are only
+retried for idempotent methods, so a failed ``POST`` never creates a record
+twice.
+
+Waits grow exponentially with full jitter. A ``Retry-After`` header sent by
+the server takes precedence over the computed wait.
+
+>>> policy = RetryPolicy(max_retries=3, backoff_factor=1)
+>>> airtable = Airtable('base_key', 'table_name', api_key, retry=policy)
+
+To disable retries:
+
+>>> airtable = Airtable('base_key', 'table_name', api_key,
+...                     retry=RetryPolicy(max_retries=0))
+
+"""  #
+
+import datetime
+import random
+import time
+from email.utils import parsedate_to_datetime
+
+
+class RetryPolicy(object):
+    """
+    Retry policy with exponential backoff and jitter.
+
+    Keyword Args:
+        max_retries (``int``, optional): Maximum number of retries per
+            request. Default is 5.
+        backoff_factor (``float``, optional): Base wait in seconds. The wait
+            before retry ``n`` is drawn uniformly from
+            ``[0, backoff_factor * 2 ** n]``. Default is 0.5.
+        max_backoff (``float``, optional): Upper bound for a single wait,
+            including ``Retry-After``. Default is 60.
+        status_codes (``set``, optional): Status codes that are retried.
+            Default is ``{429, 500, 502, 503, 504}``.
+        methods (``set``, optional): Methods for which server and connection
+            errors are retried. ``429`` is retried for every method.
+            Default is ``{'GET', 'PUT', 'PATCH', 'DELETE'}``.
+        adaptive (``bool``, optional): If True, a ``429`` halves the shared
+            request rate of the base, which then recovers additively on
+            each successful request. Default is True.
+        sleep (``callable``, optional): Function used to wait.
+    """
+
+    RETRY_STATUS_CODES = frozenset([429, 500, 502, 503, 504])
+    IDEMPOTENT_METHODS = frozenset(["GET", "PUT", "PATCH", "DELETE"])
+
+    def __init__(
+        self,
+        max_retries=5,
+        backoff_factor=0.5,
+        max_backoff=60,
+        status_codes=None,
+        methods=None,
+        adaptive=True,
+        sleep=time.sleep,
+    ):
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        if status_codes is None:
+            status_codes = self.RETRY_STATUS_CODES
+        self.status_codes = frozenset(status_codes)
+        if methods is None:
+            methods = self.IDEMPOTENT_METHODS
+        self.methods = frozenset(method.upper() for method in methods)
+        self.adaptive = adaptive
+        self._sleep = sleep
+
+    def is_retryable(self, method, attempt, response=None):
+        """
+        Returns True if a request should be retried.
+
+        Args:
+            method (``str``): HTTP method of the request.
+            attempt (``int``): Number of retries already made.
+
+        Keyword Args:
+            response (``requests.Response``, optional): Response received.
+                ``None`` for connection errors and timeouts.
+        """
+        if attempt >= self.max_retries:
+            return False
+        if response is None:
+            return method.upper() in self.methods
+        if response.status_code == 429:
+            return 429 in self.status_codes
+        if response.status_code in self.status_codes:
+            return method.upper() in self.methods
+        return False
+
+    def get_backoff(self, attempt, response=None):
+        """
+        Returns seconds to wait before retry number ``attempt``.
+        ``Retry-After`` is honored when present on ``response``.
+        """
+        if response is not None:
+            retry_after = self.parse_retry_after(response.headers.get("Retry-After"))
+            if retry_after is not None:
+                return min(self.max_backoff, retry_after)
+        ceiling = min(self.max_backoff, self.backoff_factor * (2**attempt))
+        return random.uniform(0, ceiling)
+
+    def sleep(self, attempt, response=None):
+        """Waits before retry number ``attempt``. Returns seconds waited"""
+        wait = self.get_backoff(attempt, response)
+        if wait > 0:
+            self._sleep(wait)
+        return wait
+
+    @staticmethod
+    def parse_retry_after(value):
+        """
+        Parses a ``Retry-After`` header given either as seconds or as an
+        HTTP date. Returns seconds, or ``None`` if missing or invalid.
+        """
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            date = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if date is None:
+            return None
+        if date.tzinfo is None:
+            date = date.replace(tzinfo=datetime.timezone.utc)
+        now = datetime.datetime.now(datetime.timezone.utc)
+        return max(0.0, (date - now).total_seconds())
+
+    def __repr__(self):
+        return "<RetryPolicy max_retries:{} backoff_factor:{}>".format(
+            self.max_retries, self.backoff_factor
+        )
@@ -0,0 +1,314 @@
+"""
+A :any:`TableSchema` holds the field names and types of a table, which of
+them are read-only (formulas, rollups, lookups...) and the primary field.
+
+It is used by :any:`PandasAirtable` to know the primary key without
+downloading the table, and to check and coerce values before they are sent,
+so writes are not rejected by the API for values that could be converted
+locally.
+
+A schema can be:
+
+- declared in a JSON file (see :any:`TableSchema.save`)
+- read from the Airtable metadata API, which needs the
+  ``schema.bases:read`` scope (:any:`TableSchema.from_meta`)
+- inferred from a sample of records (:any:`TableSchema.from_records`).
+  Fields that are empty in the whole sample are missing, and computed
+  fields cannot be recognized.
+
+>>> schema = TableSchema.load('schemas/Orders.json')
+>>> airtable = PandasAirtable(base_key='base_key', table_name='Orders',
+...                           api_key=api_key, schema=schema)
+>>> fields, failures = schema.coerce({'Quantity': '3', 'Total': 30})
+>>> fields
+{'Quantity': 3}
+>>> failures
+[WriteFailure(fields={'Total': 30}, error='read-only field')]
+
+"""  #
+
+import datetime
+import json
+import math
+import numbers
+import os
+import re
+import tempfile
+from collections import OrderedDict, namedtuple
+
+READ_ONLY_TYPES = frozenset(
+    [
+        "formula",
+        "rollup",
+        "count",
+        "lookup",
+        "multipleLookupValues",
+        "autoNumber",
+        "createdTime",
+        "lastModifiedTime",
+        "createdBy",
+        "lastModifiedBy",
+        "button",
+    ]
+)
+NUMBER_TYPES = frozenset(["number", "currency", "percent", "duration", "rating"])
+TEXT_TYPES = frozenset(
+    [
+        "singleLineText",
+        "multilineText",
+        "richText",
+        "email",
+        "url",
+        "phoneNumber",
+        "singleSelect",
+        "barcode",
+    ]
+)
+LIST_TYPES = frozenset(["multipleSelects", "multipleRecordLinks"])
+
+_ISO_DATE = re.compile(r"\d{4}-\d{2}-\d{2}$")
+_ISO_DATETIME = re.compile(r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}")
+_RECORD_ID = re.compile(r"rec[A-Za-z0-9]{14}$")
+
+
+WriteFailure = namedtuple("WriteFailure", ["fields", "error"])
+WriteFailure.__doc__ = (
+    """Fields rejected by the API or by a schema, with the error message"""
+)
+
+
+class SchemaError(ValueError):
+    """A value cannot be converted to the type of its field"""
+
+
+class TableSchema(object):
+    """
+    Field names and types of a table.
+
+    Args:
+        fields (``dict``): Field name to Airtable field type (e.g.
+            ``'singleLineText'``, ``'number'``, ``'formula'``), in table order.
+            ``None`` for unknown types.
+
+    Keyword Args:
+        primary_key (``str``, optional): Name of the primary field.
+            Default is the first field.
+        read_only (``list``, optional): Names of fields that cannot be
+            written, in addition to those with a computed type.
+        complete (``bool``, optional): True if ``fields`` lists every field
+            of the table, so unknown field names can be rejected before
+            sending. Default is True.
+    """
+
+    def __init__(self, fields, primary_key=None, read_only=None, complete=True):
+        self.fields = OrderedDict(fields)
+        if primary_key is None and self.fields:
+            primary_key = next(iter(self.fields))
+        self.primary_key = primary_key
+        self.read_only = set(read_only or ())
+        self.read_only.update(
+            name for name, type_ in self.fields.items() if type_ in READ_ONLY_TYPES
+        )
+        self.complete = complete
+
+    @classmethod
+    def from_records(cls, records):
+        """
+        Infers a schema from a sample of records. The first field of the
+        first record is taken as the primary key. The schema is not
+        complete.
+        """
+        fields = OrderedDict()
+        for record in records:
+            for name, value in record.get("fields", {}).items():
+                if fields.get(name) is None:
+                    fields[name] = infer_field_type(value)
+        return cls(fields, complete=False)
+
+    @classmethod
+    def from_meta(cls, table):
+        """
+        Builds a schema from a table of the Airtable metadata API
+        (``GET /v0/meta/bases/{base}/tables``).
+        """
+        fields = OrderedDict((f["name"], f["type"]) for f in table["fields"])
+        primary_key = None
+        for field in table["fields"]:
+            if field["id"] == table.get("primaryFieldId"):
+                primary_key = field["name"]
+        return cls(fields, primary_key=primary_key)
+
+    def to_dict(self):
+        return {
+            "primary_key": self.primary_key,
+            "fields": self.fields,
+            "read_only": sorted(self.read_only),
+            "complete": self.complete,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            OrderedDict(data["fields"]),
+            primary_key=data.get("primary_key"),
+            read_only=data.get("read_only"),
+            complete=data.get("complete", True),
+        )
+
+    def save(self, path):
+        """Writes the schema to a JSON file, atomically"""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(self.to_dict(), f, indent=2)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path):
+        """Reads a schema written by :any:`save`"""
+        with open(path) as f:
+            return cls.from_dict(json.load(f, object_pairs_hook=OrderedDict))
+
+    def coerce(self, fields):
+        """
+        Checks ``fields`` before they are sent and converts the values that
+        can be converted to the type of their field. Read-only fields, unknown
+        fields (for complete schemas) and values that cannot be converted are
+        left out.
+
+        Returns:
+            result (``tuple``): ``(fields, failures)``, the fields to send and
+            a list of ``WriteFailure(fields, error)`` for the others.
+        """
+        coerced = {}
+        failures = []
+        for name, value in fields.items():
+            if name in self.read_only:
+                failures.append(WriteFailure({name: value}, "read-only field"))
+                continue
+            if name not in self.fields:
+                if self.complete:
+                    failures.append(WriteFailure({name: value}, "unknown field"))
+                else:
+                    coerced[name] = value
+                continue
+            try:
+                coerced[name] = coerce_value(value, self.fields[name])
+            except SchemaError as exc:
+                failures.append(WriteFailure({name: value}, str(exc)))
+        return coerced, failures
+
+    def __repr__(self):
+        return "<TableSchema fields:{} primary_key:{}>".format(
+            len(self.fields), self.primary_key
+        )
+
+
+def infer_field_type(value):
+    """Guesses the Airtable field type of a value returned by the API"""
+    if isinstance(value, bool):
+        return "checkbox"
+    if isinstance(value, numbers.Number):
+        return "number"
+    if isinstance(value, str):
+        if _ISO_DATE.match(value):
+            return "date"
+        if _ISO_DATETIME.match(value):
+            return "dateTime"
+        return "multilineText" if "\n" in value else "singleLineText"
+    if isinstance(value, list):
+        if value and all(isinstance(v, dict) and "url" in v for v in value):
+            return "multipleAttachments"
+        if value and all(isinstance(v, str) and _RECORD_ID.match(v) for v in value):
+            return "multipleRecordLinks"
+        if all(isinstance(v, str) for v in value):
+            return "multipleSelects"
+    return None
+
+
+def coerce_value(value, field_type):
+    """
+    Converts ``value`` to what the API expects for ``field_type``.
+    Raises :any:`SchemaError` if it cannot be converted. Unknown types and
+    ``None`` are passed through.
+    """
+    if value is None or field_type is None:
+        return value
+    coercer = COERCERS.get(field_type)
+    if coercer is None:
+        return value
+    return coercer(value)
+
+
+def _coerce_number(value):
+    if isinstance(value, bool):
+        raise SchemaError("expected a number, got {!r}".format(value))
+    if isinstance(value, numbers.Number):
+        number = float(value)
+    else:
+        try:
+            number = float(str(value).strip().replace(",", ""))
+        except ValueError:
+            raise SchemaError("expected a number, got {!r}".format(value))
+    if math.isnan(number):
+        return None
+    return int(number) if number.is_integer() else number
+
+
+def _coerce_checkbox(value):
+    if not isinstance(value, str):
+        return bool(value)
+    lowered = value.strip().lower()
+    if lowered in ("true", "yes", "1", "x"):
+        return True
+    if lowered in ("false", "no", "0", ""):
+        return False
+    raise SchemaError("expected a checkbox value, got {!r}".format(value))
+
+
+def _coerce_text(value):
+    if isinstance(value, (list, dict)):
+        raise SchemaError("expected text, got {!r}".format(value))
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return value if isinstance(value, str) else str(value)
+
+
+def _coerce_list(value):
+    if isinstance(value, str):
+        return [value]
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    raise SchemaError("expected a list, got {!r}".format(value))
+
+
+def _coerce_date(value):
+    if isinstance(value, datetime.datetime):
+        return value.date().isoformat()
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return value
+
+
+def _coerce_datetime(value):
+    if not isinstance(value, datetime.datetime):
+        return value
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return value.astimezone(datetime.timezone.utc).isoformat()
+
+
+# Airtable field type -> function converting a value for it, see coerce_value
+COERCERS = {
+    "checkbox": _coerce_checkbox,
+    "date": _coerce_date,
+    "dateTime": _coerce_datetime,
+}
+COERCERS.update((field_type, _coerce_number) for field_type in NUMBER_TYPES)
+COERCERS.update((field_type, _coerce_text) for field_type in TEXT_TYPES)
+COERCERS.update((field_type, _coerce_list) for field_type in LIST_TYPES)
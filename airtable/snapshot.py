@@ -0,0 +1,151 @@
+"""
+Tables downloaded by :any:`PandasAirtable` can be kept in a local
+:any:`SnapshotStore`, so a new process starts from a file on disk instead of
+paging through the whole table again. After loading a snapshot only the
+records changed since it was taken are downloaded (see
+:any:`PandasAirtable.refresh`).
+
+Requires ``pyarrow``.
+
+>>> airtable = PandasAirtable(base_key='base_key', table_name='table_name',
+...                           api_key=api_key, snapshot_dir='~/.airframe')
+>>> df = airtable.df  # snapshot + changes since the snapshot was taken
+
+Snapshots are Arrow IPC files, memory-mapped on read. Each one is keyed by
+base, table and query parameters and stores the fetch metadata (including
+the refresh watermark) in the Arrow schema metadata. Files are written to a
+temporary file and renamed, so a reader never sees a partial snapshot.
+
+Object columns that Arrow cannot store as they are, such as linked records
+or attachments, are stored JSON encoded and decoded on load.
+
+"""  #
+
+import hashlib
+import json
+import os
+import tempfile
+
+from .arrow import _import_pyarrow
+
+METADATA_KEY = b"airframe"
+
+
+class SnapshotStore(object):
+    """
+    Directory of table snapshots.
+
+    Args:
+        directory (``str``): Directory where snapshots are stored. Created if
+            it does not exist.
+    """
+
+    VERSION = 1
+
+    def __init__(self, directory):
+        self.pa = _import_pyarrow("Table snapshots")
+        self.directory = os.path.abspath(os.path.expanduser(directory))
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def key(base_key, table_name, params=None):
+        """Returns the snapshot key of a table and query parameters"""
+        identity = json.dumps([base_key, table_name, params or {}], sort_keys=True)
+        return hashlib.sha256(identity.encode("utf-8")).hexdigest()[:32]
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ".arrow")
+
+    def save(self, key, df, metadata=None):
+        """
+        Writes ``df`` and ``metadata`` (a JSON serializable dict) as the
+        snapshot ``key``, replacing any previous one.
+        """
+        df, json_columns = _encode_object_columns(df)
+        table = self.pa.Table.from_pandas(df, preserve_index=True)
+        stored = {
+            "version": self.VERSION,
+            "json_columns": json_columns,
+            "metadata": metadata or {},
+        }
+        schema_metadata = dict(table.schema.metadata or {})
+        schema_metadata[METADATA_KEY] = json.dumps(stored).encode("utf-8")
+        table = table.replace_schema_metadata(schema_metadata)
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                with self.pa.ipc.new_file(f, table.schema) as writer:
+                    writer.write_table(table)
+            os.replace(tmp_path, self.path(key))
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    def load(self, key):
+        """
+        Reads the snapshot ``key``.
+
+        Returns:
+            snapshot (``tuple``): ``(df, metadata)``, or ``None`` if there is
+            no readable snapshot for ``key``.
+        """
+        path = self.path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with self.pa.memory_map(path, "r") as source:
+                table = self.pa.ipc.open_file(source).read_all()
+            stored = json.loads(table.schema.metadata[METADATA_KEY].decode("utf-8"))
+        except (self.pa.ArrowException, KeyError, ValueError, OSError):
+            return None
+        if stored.get("version") != self.VERSION:
+            return None
+        df = table.to_pandas()
+        for column in stored["json_columns"]:
+            df[column] = df[column].map(_json_decode)
+        return df, stored["metadata"]
+
+    def delete(self, key):
+        """Removes the snapshot ``key`` if it exists"""
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def __repr__(self):
+        return "<SnapshotStore directory:{}>".format(self.directory)
+
+
+def _encode_object_columns(df):
+    """
+    Returns a copy of ``df`` where object columns Arrow cannot store faithfully
+    are JSON encoded, and the names of those columns.
+    """
+    pa = _import_pyarrow()
+    json_columns = []
+    df = df.copy()
+    for column in df.columns[df.dtypes == object]:
+        values = df[column]
+        nested = values.map(lambda value: isinstance(value, (list, dict))).any()
+        if not nested:
+            try:
+                pa.array(values, from_pandas=True)
+                continue
+            except pa.ArrowException:
+                pass
+        df[column] = values.map(_json_encode)
+        json_columns.append(column)
+    return df, json_columns
+
+
+def _json_encode(value):
+    if value is None or (isinstance(value, float) and value != value):
+        return None
+    return json.dumps(value, default=str)
+
+
+def _json_decode(value):
+    if value is None:
+        return None
+    return json.loads(value)
@@ -7,6 +7,8 @@ from urllib.parse import urlencode, quote
 from mock import Mock
 
 from airtable import Airtable
+from airtable.ratelimit import TokenBucket
+from airtable.retry import RetryPolicy
 
 
 @pytest.fixture
@@ -38,6 +40,28 @@ def table(constants):
     )
 
 
+@pytest.fixture
+def make_table(constants):
+    """ Builds a table that is not rate limited and does not retry """
+
+    def _make_table(cls=Airtable, **kwargs):
+        kwargs.setdefault("rate_limiter", TokenBucket(1000))
+        kwargs.setdefault("retry", RetryPolicy(max_retries=0))
+        return cls(
+            base_key=constants["BASE_KEY"],
+            table_name=constants["TABLE_NAME"],
+            api_key=constants["API_KEY"],
+            **kwargs
+        )
+
+    return _make_table
+
+
+@pytest.fixture
+def fast_table(make_table):
+    return make_table()
+
+
 @pytest.fixture
 def mock_records():
     return [
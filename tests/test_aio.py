@@ -0,0 +1,174 @@
+import asyncio
+
+import pytest
+
+aiohttp = pytest.importorskip("aiohttp")
+
+from aiohttp import web  # noqa: E402
+from aiohttp.test_utils import TestServer  # noqa: E402
+
+from airtable import BatchError  # noqa: E402
+from airtable.aio import AsyncAirtable  # noqa: E402
+from airtable.ratelimit import TokenBucket  # noqa: E402
+from airtable.retry import RetryPolicy  # noqa: E402
+
+
+class FakeApi(object):
+    """Serves queued responses and records the requests received"""
+
+    def __init__(self):
+        self.responses = []
+        self.requests = []
+
+    async def handle(self, request):
+        body = await request.json() if request.can_read_body else None
+        self.requests.append(
+            {
+                "method": request.method,
+                "path": request.path,
+                "query": list(request.query.items()),
+                "headers": dict(request.headers),
+                "json": body,
+            }
+        )
+        status, payload = self.responses.pop(0)
+        return web.json_response(payload, status=status)
+
+
+def run(api, coroutine_function):
+    async def _run():
+        app = web.Application()
+        app.router.add_route("*", "/{tail:.*}", api.handle)
+        async with TestServer(app) as server:
+            table = AsyncAirtable(
+                "appJMY16gZDQrMWpA",
+                "Table Name",
+                api_key="FakeApiKey",
+                rate_limiter=TokenBucket(1000),
+                retry=RetryPolicy(max_retries=2, backoff_factor=0),
+            )
+            table.url_table = str(server.make_url("/v0/appJMY16gZDQrMWpA/Table%20Name"))
+            async with table:
+                return await coroutine_function(table)
+
+    return asyncio.run(_run())
+
+
+@pytest.fixture
+def api():
+    return FakeApi()
+
+
+def test_repr():
+    table = AsyncAirtable("x", "y", api_key="z")
+    assert "<AsyncAirtable" in repr(table)
+
+
+def test_url_matches_sync_client(table, constants):
+    async_table = AsyncAirtable(
+        constants["BASE_KEY"], constants["TABLE_NAME"], api_key=constants["API_KEY"]
+    )
+    assert async_table.url_table == table.url_table
+
+
+def test_encode_params():
+    table = AsyncAirtable("x", "y", api_key="z")
+    params = table._process_params({"fields": ["A", "B"], "max_records": 3})
+    assert table._encode_params(params) == [
+        ("fields[]", "A"),
+        ("fields[]", "B"),
+        ("maxRecords", "3"),
+    ]
+    assert table._encode_params({"offset": None}) == []
+
+
+def test_get(api, mock_response_single):
+    api.responses = [(200, mock_response_single)]
+    resp = run(api, lambda table: table.get(mock_response_single["id"]))
+    assert resp == mock_response_single
+    assert api.requests[0]["path"].endswith("/" + mock_response_single["id"])
+    assert api.requests[0]["headers"]["Authorization"] == "Bearer FakeApiKey"
+
+
+def test_get_all(api, mock_response_list, mock_records):
+    api.responses = [(200, page) for page in mock_response_list]
+    resp = run(api, lambda table: table.get_all(view="View"))
+    assert resp == mock_records
+    assert api.requests[0]["query"] == [("view", "View")]
+    assert ("offset", "recuOeLpF6TQpArJi") in api.requests[1]["query"]
+
+
+def test_get_iter(api, mock_response_list):
+    api.responses = [(200, page) for page in mock_response_list]
+
+    async def pages(table):
+        return [page async for page in table.get_iter()]
+
+    assert run(api, pages) == [page["records"] for page in mock_response_list]
+
+
+def test_search(api, mock_response_single):
+    api.responses = [(200, {"records": [mock_response_single]})]
+    resp = run(api, lambda table: table.search("Value", "abc"))
+    assert resp == [mock_response_single]
+    assert api.requests[0]["query"] == [("filterByFormula", "{Value}='abc'")]
+
+
+def test_match_not_found(api):
+    api.responses = [(200, {"records": []})]
+    assert run(api, lambda table: table.match("Value", "abc")) == {}
+
+
+def test_insert(api, mock_response_single):
+    api.responses = [(200, mock_response_single)]
+    resp = run(api, lambda table: table.insert(mock_response_single["fields"]))
+    assert resp == mock_response_single
+    assert api.requests[0]["method"] == "POST"
+    assert api.requests[0]["json"]["fields"] == mock_response_single["fields"]
+
+
+def test_batch_insert(api):
+    records = [{"Value": i} for i in range(25)]
+    api.responses = [
+        (200, {"records": [{"id": "rec", "fields": f} for f in records[i : i + 10]]})
+        for i in range(0, 25, 10)
+    ]
+    resp = run(api, lambda table: table.batch_insert(records))
+    assert len(resp) == 25
+    assert len(api.requests) == 3
+
+
+def test_batch_delete(api, mock_records):
+    ids = [r["id"] for r in mock_records]
+    api.responses = [(200, {"records": [{"deleted": True, "id": i} for i in ids]})]
+    resp = run(api, lambda table: table.batch_delete(ids))
+    assert resp == [{"deleted": True, "id": i} for i in ids]
+    assert api.requests[0]["query"] == [("records", i) for i in ids]
+
+
+def test_retry_then_success(api, mock_response_single):
+    api.responses = [(429, {}), (503, {}), (200, mock_response_single)]
+    resp = run(api, lambda table: table.get(mock_response_single["id"]))
+    assert resp == mock_response_single
+    assert len(api.requests) == 3
+
+
+def test_error_message_added(api, mock_response_single):
+    api.responses = [(422, {"error": {"type": "INVALID_REQUEST"}})]
+    with pytest.raises(aiohttp.ClientResponseError) as excinfo:
+        run(api, lambda table: table.get(mock_response_single["id"]))
+    assert "INVALID_REQUEST" in str(excinfo.value)
+
+
+def test_batch_insert_reports_failed_chunks(api):
+    records = [{"Value": i} for i in range(25)]
+    api.responses = [
+        (200, {"records": [{"id": "rec", "fields": f} for f in records[:10]]}),
+        (422, {"error": {"type": "INVALID_VALUE_FOR_COLUMN"}}),
+        (200, {"records": [{"id": "rec", "fields": f} for f in records[20:]]}),
+    ]
+    with pytest.raises(BatchError) as excinfo:
+        run(api, lambda table: table.batch_insert(records))
+    assert len(excinfo.value.records) == 25
+    assert len(excinfo.value.failures) == 1
+    assert len(api.requests) == 3
@@ -0,0 +1,872 @@
+import sys
+
+import pytest
+from requests import HTTPError
+from requests_mock import Mocker
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+pytest.importorskip("boto3")
+
+from airtable.airframe import PandasAirtable  # noqa: E402
+
+
+@pytest.fixture
+def pandas_table(make_table):
+    return make_table(PandasAirtable)
+
+
+def test_get_many_as_df(pandas_table, mock_records):
+    ids = [r["id"] for r in mock_records]
+    with Mocker() as mock:
+        mock.get(pandas_table.url_table, json={"records": mock_records})
+        df, missing = pandas_table.get_many(
+            [ids[1], ids[0], "recMissing1234567"], return_missing=True
+        )
+        assert mock.call_count == 1
+    assert list(df.index) == [ids[1], ids[0]]
+    assert df.index.name == "record_id"
+    assert list(df["Value"]) == ["def", "abc"]
+    assert missing == ["recMissing1234567"]
+    assert df.af.table is pandas_table
+
+
+def test_get_record_ids(pandas_table, capsys):
+    records = [
+        {"id": "rec1", "fields": {"Name": "a"}},
+        {"id": "rec2", "fields": {"Name": "b"}},
+        {"id": "rec3", "fields": {"Name": "b"}},
+    ]
+    with Mocker() as mock:
+        mock.get(pandas_table.url_table, json={"records": records})
+        record_ids = pandas_table.get_record_ids("Name", ["a", "b", "c"])
+        assert mock.call_count == 1
+    assert record_ids == {"a": "rec1", "b": None, "c": None}
+    assert "More than one matching record" in capsys.readouterr().out
+
+
+@pytest.fixture
+def indexed_table(pandas_table, mock_records):
+    pandas_table.primary_key = "Value"
+    with Mocker() as mock:
+        mock.get(pandas_table.url_table, json={"records": mock_records})
+        pandas_table.build_record_id_index()
+        assert mock.last_request.qs["fields[]"] == ["value"]
+    return pandas_table
+
+
+def test_record_id_index_lookups_are_local(indexed_table, mock_records):
+    with Mocker():  # any request would fail
+        assert indexed_table.get_record_id("Value", "def") == mock_records[1]["id"]
+        assert indexed_table.get_record_ids("Value", ["abc", "zzz"]) == {
+            "abc": mock_records[0]["id"],
+            "zzz": None,
+        }
+        row = pd.Series({"Value": "xyz", "SameField": 789}, name=3)
+        row.af.table = indexed_table
+        assert row.af.record_id == mock_records[2]["id"]
+
+
+def test_record_id_index_follows_writes(indexed_table, mock_records):
+    new = {"id": "recNewRecord12345", "fields": {"Value": "new"}}
+    deleted = mock_records[0]["id"]
+    with Mocker() as mock:
+        mock.post(indexed_table.url_table, json=new)
+        mock.patch(
+            indexed_table.record_url(mock_records[1]["id"]),
+            json={"id": mock_records[1]["id"], "fields": {"Value": "renamed"}},
+        )
+        mock.delete(
+            indexed_table.record_url(deleted), json={"deleted": True, "id": deleted}
+        )
+        indexed_table.insert({"Value": "new"})
+        indexed_table.update(mock_records[1]["id"], {"Value": "renamed"})
+        indexed_table.delete(deleted)
+    index = indexed_table.record_id_index
+    assert index.get("new") == ["recNewRecord12345"]
+    assert index.get("renamed") == [mock_records[1]["id"]]
+    assert "def" not in index
+    assert "abc" not in index
+    assert len(index) == 3
+
+
+def test_record_id_index_can_be_disabled(make_table, mock_records):
+    table = make_table(PandasAirtable, primary_key="Value", index_record_ids=False)
+    with Mocker() as mock:
+        mock.get(table.url_table, json={"records": [mock_records[0]]})
+        assert table.get_record_id("Value", "abc") == mock_records[0]["id"]
+        assert "filterbyformula" in mock.last_request.qs
+
+
+def echo_batch(request, context):
+    body = request.json()
+    return {
+        "records": [
+            {
+                "id": r.get("id") or "rec{:014d}".format(r["fields"]["Num"]),
+                "fields": r["fields"],
+            }
+            for r in body["records"]
+        ]
+    }
+
+
+@pytest.fixture
+def frame():
+    return pd.DataFrame(
+        {
+            "Name": ["n{}".format(i) for i in range(25)],
+            "Num": range(25),
+            "Score": [0.5 if i % 2 else None for i in range(25)],
+        }
+    )
+
+
+def test_dataframe_to_airtable_fields():
+    from airtable.airframe import DataFrame_to_airtable_fields
+
+    df = pd.DataFrame(
+        {"a": [1, 2], "b": [1.5, None], "c": ["x", None], "d": [["l"], ["m"]]}
+    )
+    fields = DataFrame_to_airtable_fields(df)
+    assert fields == [
+        {"a": 1, "b": 1.5, "c": "x", "d": ["l"]},
+        {"a": 2, "b": None, "c": None, "d": ["m"]},
+    ]
+    assert type(fields[0]["a"]) is int
+
+
+def test_typecast_column_dtypes():
+    import json
+
+    from airtable.airframe import DataFrame_to_airtable_fields
+
+    df = pd.DataFrame(
+        {
+            "float": [1.5, float("nan"), float("inf")],
+            "bool": [True, False, True],
+            "Int64": pd.array([1, None, 3], dtype="Int64"),
+            "boolean": pd.array([True, None, False], dtype="boolean"),
+            "string": pd.array(["x", None, "z"], dtype="string"),
+            "category": pd.Categorical(["a", None, "a"]),
+            "datetime": pd.to_datetime(["2020-01-02 03:04:05.123", None, None]),
+            "utc": pd.to_datetime(["2020-01-02 03:04:05"] * 3, utc=True),
+            "timedelta": pd.to_timedelta([1, None, 2], unit="m"),
+        }
+    )
+    fields = DataFrame_to_airtable_fields(df)
+    json.dumps(fields)
+    assert fields[0] == {
+        "float": 1.5,
+        "bool": True,
+        "Int64": 1,
+        "boolean": True,
+        "string": "x",
+        "category": "a",
+        "datetime": "2020-01-02T03:04:05.123Z",
+        "utc": "2020-01-02T03:04:05.000Z",
+        "timedelta": 60.0,
+    }
+    assert fields[1] == {
+        "float": None,
+        "bool": False,
+        "Int64": None,
+        "boolean": None,
+        "string": None,
+        "category": None,
+        "datetime": None,
+        "utc": "2020-01-02T03:04:05.000Z",
+        "timedelta": None,
+    }
+    assert fields[2]["float"] is None
+    assert type(fields[0]["bool"]) is bool
+
+
+def test_series_to_airtable_fields():
+    from airtable.airframe import Series_to_airtable_fields
+
+    row = pd.Series(
+        {
+            "n": np.int64(3),
+            "b": np.bool_(True),
+            "x": np.float64("nan"),
+            "t": pd.Timestamp("2020-01-01"),
+            "l": [np.int64(1)],
+            "na": pd.NA,
+        }
+    )
+    fields = Series_to_airtable_fields(row)
+    assert fields == {
+        "n": 3,
+        "b": True,
+        "x": None,
+        "t": "2020-01-01T00:00:00.000Z",
+        "l": [1],
+        "na": None,
+    }
+    assert type(fields["n"]) is int and type(fields["l"][0]) is int
+
+
+def test_row_fields_match_frame_conversion():
+    from airtable.airframe import DataFrame_to_airtable_fields
+
+    df = pd.DataFrame(
+        {
+            "n": pd.array([1, None], dtype="Int64"),
+            "x": [1.5, np.nan],
+            "t": pd.to_datetime(["2020-01-01", None]),
+        }
+    )
+    frame_fields = DataFrame_to_airtable_fields(df)
+    assert [df.iloc[i].af.fields for i in range(2)] == frame_fields
+    assert frame_fields[1] == {"n": None, "x": None, "t": None}
+
+
+def test_af_insert_batches_and_sets_record_ids(pandas_table, frame):
+    frame.af.table = pandas_table
+    with Mocker() as mock:
+        mock.post(pandas_table.url_table, json=echo_batch)
+        records = frame.af.insert()
+        assert mock.call_count == 3
+    assert len(records) == 25
+    assert frame.index.name == "record_id"
+    assert frame.index[3] == "rec00000000000003"
+
+
+def test_af_update_by_record_id(pandas_table, frame):
+    frame.index = pd.Index(
+        ["rec{:014d}".format(i) for i in range(25)], name="record_id"
+    )
+    frame.af.table = pandas_table
+    with Mocker() as mock:
+        mock.patch(pandas_table.url_table, json=echo_batch)
+        records = frame.af.update(columns=["Score"])
+        sent = mock.request_history[0].json()["records"][1]
+        assert mock.call_count == 3
+    assert sent == {"id": "rec00000000000001", "fields": {"Score": 0.5}}
+    assert [r["id"] for r in records] == list(frame.index)
+
+
+def test_af_upsert_by_primary_key(indexed_table):
+    df = pd.DataFrame({"Value": ["abc", "new"], "Num": [1, 99]})
+    df.af.table = indexed_table
+    with Mocker() as mock:
+        mock.patch(indexed_table.url_table, json=echo_batch)
+        mock.post(indexed_table.url_table, json=echo_batch)
+        records = df.af.upsert(primary_key="Value")
+        methods = [r.method for r in mock.request_history]
+    assert sorted(methods) == ["PATCH", "POST"]
+    assert records[0]["id"] == "recH73JJvr7vv1234"
+    assert records[1]["id"] == "rec00000000000099"
+    assert list(df.index) == ["recH73JJvr7vv1234", "rec00000000000099"]
+
+
+def test_af_update_partial_match_keeps_index(indexed_table):
+    df = pd.DataFrame({"Value": ["abc", "new"], "Num": [1, 99]})
+    df.af.table = indexed_table
+    with Mocker() as mock:
+        mock.patch(indexed_table.url_table, json=echo_batch)
+        records = df.af.update(primary_key="Value")
+    assert records[0]["id"] == "recH73JJvr7vv1234" and records[1] is None
+    assert list(df.index) == [0, 1]
+
+
+def reject_bad(request, context):
+    """Echoes inserts and updates, but rejects records with a "Bad" value"""
+    body = request.json()
+    records = body.get("records", [body])
+    if any(r["fields"].get("Bad") is not None for r in records):
+        context.status_code = 422
+        return {"error": {"type": "INVALID_VALUE_FOR_COLUMN"}}
+    if request.method == "PATCH" and "records" not in body:
+        return {"id": request.url.rsplit("/", 1)[-1], "fields": body["fields"]}
+    if "records" in body:
+        return echo_batch(request, context)
+    return {"id": "rec{:014d}".format(body["fields"]["Num"]), "fields": body["fields"]}
+
+
+def test_af_insert_bisects_rejected_batch(pandas_table):
+    df = pd.DataFrame({"Num": range(10), "Bad": [None] * 10})
+    df = df.astype(object)
+    df.at[6, "Bad"] = "x"
+    df.af.table = pandas_table
+    with Mocker() as mock:
+        mock.post(pandas_table.url_table, json=reject_bad)
+        mock.patch(pandas_table.record_url("rec00000000000006"), json=reject_bad)
+        records = df.af.insert()
+        sizes = [len(r.json().get("records", [None])) for r in mock.request_history]
+    # batches of 10, 5, 5, 2, 1, 1, 3 then fields of the bad record, halved
+    assert sizes == [10, 5, 5, 2, 1, 1, 1, 1, 1, 3]
+    assert [r["id"] for r in records] == ["rec{:014d}".format(i) for i in range(10)]
+    assert records[6].failed_fields == ["Bad"]
+    assert records[6].failures[0].error.endswith("INVALID_VALUE_FOR_COLUMN'}]")
+
+
+def test_af_delete(indexed_table, mock_records):
+    df = pd.DataFrame({"Value": ["abc", "missing", "xyz"]})
+    df.af.table = indexed_table
+    ids = [mock_records[0]["id"], mock_records[2]["id"]]
+    with Mocker() as mock:
+        mock.delete(
+            indexed_table.url_table,
+            json={"records": [{"deleted": True, "id": i} for i in ids]},
+        )
+        records = df.af.delete(primary_key="Value")
+        assert mock.call_count == 1
+    assert records[1] is None
+    assert [records[0]["id"], records[2]["id"]] == ids
+
+
+def test_bulk_upsert(indexed_table, mock_records):
+    df = pd.DataFrame(
+        {"Value": ["abc", "new", "xyz"], "Num": [1, 2, 3]}, index=["a", "b", "c"]
+    )
+    with Mocker() as mock:
+        mock.post(indexed_table.url_table, json=echo_batch)
+        mock.patch(indexed_table.url_table, json=echo_batch)
+        outcome = indexed_table.bulk_upsert(df)
+        methods = [r.method for r in mock.request_history]
+        patched = mock.request_history[methods.index("PATCH")].json()["records"]
+    assert sorted(methods) == ["PATCH", "POST"]
+    assert [r["id"] for r in patched] == [mock_records[0]["id"], mock_records[2]["id"]]
+    assert list(outcome.index) == ["a", "b", "c"]
+    assert list(outcome["action"]) == ["update", "insert", "update"]
+    assert list(outcome["record_id"]) == [
+        mock_records[0]["id"],
+        "rec00000000000002",
+        mock_records[2]["id"],
+    ]
+    assert outcome["error"].isna().all()
+
+
+def test_bulk_upsert_skips_and_reports_errors(indexed_table):
+    df = pd.DataFrame({"Value": ["abc", "new"], "Num": [1, 2]})
+    with Mocker() as mock:
+        mock.post(indexed_table.url_table, status_code=422, json={"error": "bad"})
+        outcome = indexed_table.bulk_upsert(df, overwrite=False, robust=False)
+        assert mock.call_count == 1
+    assert list(outcome["action"]) == ["skipped", "error"]
+    assert outcome["error"][1].endswith("[Error: bad]")
+
+
+def test_upload_df_to_airtable_uses_search_many(table, mock_records):
+    from airtable.airframe import upload_df_to_airtable
+
+    df = pd.DataFrame({"Value": ["abc", "new"], "Num": [1, 2]})
+    with Mocker() as mock:
+        mock.get(table.url_table, json={"records": [mock_records[0]]})
+        mock.post(table.url_table, json=echo_batch)
+        mock.patch(table.url_table, json=echo_batch)
+        outcome = upload_df_to_airtable(table, df, primary_key="Value", overwrite=True)
+        assert [r.method for r in mock.request_history] == ["GET", "POST", "PATCH"]
+    assert list(outcome["action"]) == ["update", "insert"]
+
+
+def test_upload_df_to_airtable_robust_update_with_plain_airtable(table):
+    from airtable.airframe import upload_df_to_airtable
+
+    record_id = "rec00000000000001"
+    df = pd.DataFrame({"Num": [1], "A": ["a"], "Bad": ["x"]})
+    with Mocker() as mock:
+        mock.get(
+            table.url_table, json={"records": [{"id": record_id, "fields": {"Num": 1}}]}
+        )
+        mock.patch(table.url_table, json=reject_bad)
+        mock.patch(table.record_url(record_id), json=reject_bad)
+        outcome = upload_df_to_airtable(
+            table, df, primary_key="Num", overwrite=True, try_one_field_at_a_time=True
+        )
+    assert list(outcome["action"]) == ["update"]
+    assert outcome["record_id"][0] == record_id
+    assert outcome["error"][0] == "failed fields: Bad"
+
+
+def test_refresh_merges_changes_and_drops_deleted(pandas_table, mock_records):
+    changed = {"id": mock_records[1]["id"], "fields": {"Value": "DEF", "New": 1}}
+    new = {"id": "recNewRecord12345", "fields": {"Value": "new"}}
+    with Mocker() as mock:
+        mock.get(
+            pandas_table.url_table,
+            [
+                {"json": {"records": mock_records}},
+                {"json": {"records": [changed, new]}},
+                {"json": {"records": [changed, new, mock_records[2]]}},
+            ],
+        )
+        assert len(pandas_table.df) == 3
+        df = pandas_table.refresh()
+        formula = mock.request_history[1].qs["filterbyformula"][0]
+        assert "is_after(last_modified_time()" in formula
+        assert mock.request_history[2].qs["fields[]"] == ["samefield"]
+    assert list(df.index) == [
+        mock_records[1]["id"],
+        mock_records[2]["id"],
+        "recNewRecord12345",
+    ]
+    assert df.loc[mock_records[1]["id"], "Value"] == "DEF"
+    assert pd.isna(df.loc[mock_records[1]["id"], "SameField"])
+    assert df.loc[mock_records[2]["id"], "SameField"] == 789
+    assert df.index.name == "record_id"
+    assert pandas_table.df is df
+    assert pandas_table.get_record_id("SameField", 789) == mock_records[2]["id"]
+
+
+def test_refresh_without_deletions_uses_one_request(pandas_table, mock_records):
+    pandas_table.df = pd.DataFrame()
+    with Mocker() as mock:
+        mock.get(pandas_table.url_table, json={"records": mock_records})
+        pandas_table.refresh()  # no watermark, full download
+        pandas_table.refresh(detect_deletions=False)
+        assert mock.call_count == 2
+        assert "filterByFormula" in mock.last_request.url
+
+
+def test_dataframe_builder_pages():
+    from airtable.airframe import DataFrameBuilder
+
+    builder = DataFrameBuilder()
+    builder.add_records([{"id": "rec1", "fields": {"A": 1}}])
+    builder.add_records(
+        [
+            {"id": "rec2", "fields": {"B": ["x"], "A": 2}},
+            {"id": "rec3", "fields": {}},
+        ]
+    )
+    assert len(builder) == 3
+    df = builder.build()
+    assert list(df.columns) == ["A", "B"]
+    assert list(df.index) == ["rec1", "rec2", "rec3"]
+    assert df.index.name == "record_id"
+    assert df["A"].tolist()[:2] == [1.0, 2.0]
+    assert df["B"].iloc[1] == ["x"]
+    assert pd.isna(df["B"].iloc[0]) and df.iloc[2].isna().all()
+
+
+def test_to_df_streams_pages(pandas_table, mock_records):
+    with Mocker() as mock:
+        mock.get(
+            pandas_table.url_table,
+            [
+                {"json": {"records": mock_records[:2], "offset": "itr1"}},
+                {"json": {"records": mock_records[2:]}},
+            ],
+        )
+        df = pandas_table.to_df()
+        assert mock.call_count == 2
+    assert list(df.index) == [r["id"] for r in mock_records]
+    assert df["SameField"].tolist() == [1234, 456, 789]
+
+
+def test_to_df_iter_chunks_and_schema(pandas_table):
+    records = [
+        {"id": "rec{:014d}".format(i), "fields": {"A": i, "B" if i > 3 else "A": i}}
+        for i in range(7)
+    ]
+    with Mocker() as mock:
+        mock.get(
+            pandas_table.url_table,
+            [
+                {"json": {"records": records[:4], "offset": "itr1"}},
+                {"json": {"records": records[4:]}},
+            ],
+        )
+        chunks = list(pandas_table.to_df_iter(chunk_rows=3))
+    assert [len(chunk) for chunk in chunks] == [3, 3, 1]
+    assert [list(chunk.columns) for chunk in chunks] == [["A"], ["A", "B"], ["A", "B"]]
+    assert chunks[1].index[0] == "rec00000000000003"
+    assert chunks[2].index.name == "record_id"
+    assert pd.isna(chunks[1].loc["rec00000000000003", "B"])
+
+
+def test_to_df_iter_fixed_columns(pandas_table, mock_records):
+    with Mocker() as mock:
+        mock.get(pandas_table.url_table, json={"records": mock_records})
+        chunks = list(pandas_table.to_df_iter(chunk_rows=2, fields=["Value", "Other"]))
+        assert mock.last_request.qs["fields[]"] == ["value", "other"]
+    assert [list(chunk.columns) for chunk in chunks] == [["Value", "Other"]] * 2
+
+
+@pytest.fixture
+def typed_records():
+    status = ["todo", "done"]
+    return [
+        {
+            "id": "rec{:014d}".format(i),
+            "createdTime": "2020-01-0{}T10:00:00.000Z".format(i + 1),
+            "fields": dict(
+                {
+                    "Status": status[i % 2],
+                    "Name": "name {}".format(i),
+                    "Due": "2020-02-0{}".format(i + 1),
+                    "Links": ["recA"],
+                },
+                **({"Count": i, "Done": True} if i % 3 else {}),
+            ),
+        }
+        for i in range(6)
+    ]
+
+
+def test_compact_dtypes_inferred(typed_records):
+    from airtable.airframe import airtable_records_to_DataFrame
+
+    df = airtable_records_to_DataFrame(typed_records, compact=True, created_time=True)
+    assert df["Status"].dtype == "category"
+    assert df["Name"].dtype == object
+    assert df["Count"].dtype == "Int64"
+    assert df["Done"].dtype == "boolean"
+    assert df["Due"].dtype == "datetime64[ns]"
+    assert df["Links"].dtype == object
+    assert str(df["createdTime"].dtype) == "datetime64[ns, UTC]"
+    assert df["createdTime"].iloc[0] == pd.Timestamp("2020-01-01T10:00Z")
+
+
+def test_compact_dtypes_schema(typed_records):
+    from airtable.airframe import airtable_records_to_DataFrame, compact_dtypes
+
+    df = airtable_records_to_DataFrame(typed_records)
+    df["Code"] = pd.Series(
+        ["a", "b", "c", "d", "e", "f"], index=df.index, dtype="string"
+    )
+    schema = {"Done": "checkbox", "Name": "singleSelect", "Code": "singleSelect"}
+    compact = compact_dtypes(df, schema=schema)
+    assert compact["Done"].tolist() == [False, True, True, False, True, True]
+    assert compact["Name"].dtype == "category"
+    assert compact["Code"].dtype == "category"
+    assert df["Done"].dtype == object  # input is left unchanged
+
+
+def test_sparse_round_trip():
+    from airtable.airframe import (
+        DataFrame_to_airtable_fields,
+        airtable_records_to_DataFrame,
+    )
+
+    records = [
+        {"id": "rec{:014d}".format(i), "fields": dict({"Name": str(i)}, **extra)}
+        for i, extra in enumerate(
+            [{"Rare": 1.5}, {}, {}, {"Note": ["recA"]}, {}, {}, {}, {}]
+        )
+    ]
+    df = airtable_records_to_DataFrame(records, sparse=0.5)
+    assert df["Name"].dtype == object
+    assert isinstance(df["Rare"].dtype, pd.SparseDtype)
+    assert isinstance(df["Note"].dtype, pd.SparseDtype)
+    assert df["Rare"].array.npoints == 1
+    assert df["Note"].iloc[3] == ["recA"]
+
+    fields = DataFrame_to_airtable_fields(df)
+    assert fields[0] == {"Name": "0", "Rare": 1.5}
+    assert fields[1] == {"Name": "1"}
+    assert fields[3] == {"Name": "3", "Note": ["recA"]}
+    assert DataFrame_to_airtable_fields(df[["Rare"]])[:2] == [{"Rare": 1.5}, {}]
+
+
+def test_sparse_builder_matches_sparsify():
+    from airtable.airframe import DataFrameBuilder, sparsify
+
+    records = [
+        {"id": "rec{:014d}".format(i), "fields": {"Name": str(i)}} for i in range(10)
+    ]
+    records[2]["fields"].update(Count=3, Tags=["a", "b"])
+    records[7]["fields"].update(Count=4, Flag=True)
+    sparse_builder = DataFrameBuilder(sparse=0.5)
+    dense_builder = DataFrameBuilder()
+    for builder in (sparse_builder, dense_builder):
+        builder.add_records(records[:5])
+        builder.add_records(records[5:])
+    # only the populated cells are stored while building
+    assert sparse_builder._columns["Count"] == ([2, 7], [3, 4])
+    df = sparse_builder.build()
+    expected = sparsify(dense_builder.build(), threshold=0.5)
+    pd.testing.assert_frame_equal(df, expected)
+    assert df["Count"].dtype == pd.SparseDtype(float, np.nan)
+    assert df["Tags"].iloc[2] == ["a", "b"]
+
+
+def test_sparse_array_without_private_index(monkeypatch):
+    from airtable.airframe import _sparse_array
+
+    expected = _sparse_array([1, 3], [["a"], ["b"]], 5)
+    monkeypatch.setitem(sys.modules, "pandas._libs.sparse", None)
+    pd.testing.assert_extension_array_equal(
+        _sparse_array([1, 3], [["a"], ["b"]], 5), expected
+    )
+    pd.testing.assert_extension_array_equal(
+        _sparse_array([0, 4], [1, 2], 5),
+        pd.arrays.SparseArray([1.0, np.nan, np.nan, np.nan, 2.0]),
+    )
+
+
+def test_sparsify_only_below_threshold():
+    from airtable.airframe import sparsify
+
+    df = pd.DataFrame({"a": [1.0, None, None, None], "b": [1.0, 2.0, None, None]})
+    sparse = sparsify(df, threshold=0.5)
+    assert isinstance(sparse["a"].dtype, pd.SparseDtype)
+    assert sparse["b"].dtype == float
+    assert df["a"].dtype == float
+
+
+def test_af_update_sends_only_changed_cells(pandas_table, mock_records):
+    with Mocker() as mock:
+        mock.get(pandas_table.url_table, json={"records": mock_records})
+        frame = pd.DataFrame()
+        frame.af.table = pandas_table
+        df = frame.af.get()
+    assert df.af.pulled is not None
+
+    df.loc[mock_records[1]["id"], "Value"] = "changed"
+    df["Tags"] = None
+    df.at[mock_records[2]["id"], "Tags"] = ["a"]
+    changed = df.af.changed_cells()
+    assert changed.sum().to_dict() == {"SameField": 0, "Value": 1, "Tags": 3}
+
+    del df["Tags"]
+    df.loc[mock_records[2]["id"], "SameField"] = 0
+    with Mocker() as mock:
+        mock.patch(pandas_table.url_table, json=echo_batch)
+        records = df.af.update()
+        assert mock.call_count == 1
+        sent = mock.last_request.json()["records"]
+    assert sent == [
+        {"id": mock_records[1]["id"], "fields": {"Value": "changed"}},
+        {"id": mock_records[2]["id"], "fields": {"SameField": 0}},
+    ]
+    assert records[0] is None
+
+    with Mocker() as mock:  # nothing left to send
+        assert df.af.update() == [None, None, None]
+        assert mock.call_count == 0
+
+
+def test_af_update_only_changed_with_sparse_column(pandas_table):
+    ids = ["rec{:014d}".format(i) for i in range(4)]
+    df = pd.DataFrame(
+        {
+            "A": ["a", "b", "c", "d"],
+            "S": pd.arrays.SparseArray([1.0, np.nan, np.nan, np.nan]),
+            "B": [1, 2, 3, 4],
+        },
+        index=pd.Index(ids, name="record_id"),
+    )
+    df.af.table = pandas_table
+    df.af.pulled = df.copy()
+    df.loc[ids[0], "B"] = 10
+    with Mocker() as mock:
+        mock.patch(pandas_table.url_table, json=echo_batch)
+        df.af.update()
+        sent = mock.last_request.json()["records"]
+    assert sent == [{"id": ids[0], "fields": {"B": 10}}]
+
+
+def test_af_update_only_changed_clears_sparse_cells(pandas_table):
+    ids = ["rec{:014d}".format(i) for i in range(4)]
+    df = pd.DataFrame(
+        {
+            "A": ["a", "b", "c", "d"],
+            "S": pd.arrays.SparseArray([1.0, np.nan, np.nan, np.nan]),
+        },
+        index=pd.Index(ids, name="record_id"),
+    )
+    df.af.table = pandas_table
+    df.af.pulled = df.copy()
+    df["S"] = pd.arrays.SparseArray([np.nan] * 4)
+    with Mocker() as mock:
+        mock.patch(pandas_table.url_table, json=echo_batch)
+        df.af.update()
+        assert mock.call_count == 1
+        sent = mock.last_request.json()["records"]
+    assert sent == [{"id": ids[0], "fields": {"S": None}}]
+
+
+def test_reconcile(pandas_table, mock_records):
+    df = pd.DataFrame(
+        {"Value": ["abc", "def", "new"], "SameField": [1234.0, 999.0, None]}
+    )
+    with Mocker() as mock:
+        mock.get(pandas_table.url_table, json={"records": mock_records})
+        plan = pandas_table.reconcile(df, key="Value", delete=True, dry_run=True)
+        assert mock.last_request.qs["fields[]"] == ["value", "samefield"]
+        assert mock.call_count == 1
+    assert plan.unchanged == 1
+    assert plan.inserts == [{"Value": "new", "SameField": None}]
+    assert plan.updates == [
+        {"id": mock_records[1]["id"], "fields": {"SameField": 999.0}}
+    ]
+    assert plan.deletes == [mock_records[2]["id"]]
+    assert len(plan) == 3
+
+    with Mocker() as mock:
+        mock.post(pandas_table.url_table, json={"records": [{"id": "recNew"}]})
+        mock.patch(pandas_table.url_table, json={"records": [{"id": "recUpd"}]})
+        mock.delete(
+            pandas_table.record_url(mock_records[2]["id"]), json={"deleted": True}
+        )
+        results = plan.apply()
+        assert [r.method for r in mock.request_history] == ["POST", "PATCH", "DELETE"]
+    assert results["inserted"] == [{"id": "recNew"}]
+
+
+def test_reconcile_normalizes_values(pandas_table):
+    remote = [
+        {"id": "rec1", "fields": {"Key": "a", "N": 1, "Tags": ["x"]}},
+        {"id": "rec2", "fields": {"Key": "b"}},
+    ]
+    df = pd.DataFrame(
+        {
+            "Key": ["a", "b"],
+            "N": [1.0, None],
+            "Tags": [["x"], []],
+            "Done": [False, False],
+        }
+    )
+    with Mocker() as mock:
+        mock.get(pandas_table.url_table, json={"records": remote})
+        plan = pandas_table.reconcile(df, key="Key", dry_run=True)
+    assert len(plan) == 0
+    assert plan.unchanged == 2
+
+
+def test_reconcile_compact_frame_has_no_changes(pandas_table):
+    remote = [
+        {"id": "rec1", "fields": {"Key": "a", "D": "2020-01-01"}},
+        {"id": "rec2", "fields": {"Key": "b", "D": "2020-01-02"}},
+    ]
+    with Mocker() as mock:
+        mock.get(pandas_table.url_table, json={"records": remote})
+        df = pandas_table.to_df(compact=True).reset_index(drop=True)
+        assert df["D"].dtype == "datetime64[ns]"
+        plan = pandas_table.reconcile(df, key="Key", dry_run=True)
+    assert len(plan) == 0
+    assert plan.unchanged == 2
+
+
+def test_reconcile_skips_empty_and_duplicate_keys(pandas_table, capsys):
+    remote = [{"id": "rec1", "fields": {"Key": "a", "N": 1}}]
+    df = pd.DataFrame({"Key": ["a", None, "a", "b"], "N": [5, 2, 6, 3]})
+    with Mocker() as mock:
+        mock.get(pandas_table.url_table, json={"records": remote})
+        plan = pandas_table.reconcile(df, key="Key", dry_run=True)
+    assert plan.updates == [{"id": "rec1", "fields": {"N": 5}}]
+    assert plan.inserts == [{"Key": "b", "N": 3}]
+    out = capsys.readouterr().out
+    assert "1 rows without Key are skipped" in out
+    assert "1 rows repeat the Key" in out
+
+
+def test_reconcile_clears_sparse_cells(pandas_table):
+    remote = [
+        {"id": "rec1", "fields": {"Key": "a", "S": "old"}},
+        {"id": "rec2", "fields": {"Key": "b"}},
+    ]
+    df = pd.DataFrame(
+        {
+            "Key": ["a", "b", "c"],
+            "S": pd.arrays.SparseArray(
+                [np.nan, np.nan, "z"], dtype=pd.SparseDtype(object, np.nan)
+            ),
+        }
+    )
+    with Mocker() as mock:
+        mock.get(pandas_table.url_table, json={"records": remote})
+        plan = pandas_table.reconcile(df, key="Key", dry_run=True)
+    assert plan.updates == [{"id": "rec1", "fields": {"S": None}}]
+    assert plan.inserts == [{"Key": "c", "S": "z"}]
+    assert plan.unchanged == 1
+
+
+def test_robust_update_bisects_fields(pandas_table):
+    record_id = "rec00000000000001"
+    fields = {"F{}".format(i): i for i in range(7)}
+    fields["Bad"] = "x"
+    with Mocker() as mock:
+        mock.patch(pandas_table.record_url(record_id), json=reject_bad)
+        report = pandas_table.robust_update(record_id, fields)
+        sizes = [len(r.json()["fields"]) for r in mock.request_history]
+    assert sizes == [8, 4, 4, 2, 2, 1, 1]
+    assert report["id"] == record_id
+    assert not report.ok
+    assert report.failed_fields == ["Bad"]
+    assert report.failures[0].fields == {"Bad": "x"}
+
+
+def test_robust_insert_single_rejected_field_inserts_nothing(pandas_table):
+    with Mocker() as mock:
+        mock.post(pandas_table.url_table, json=reject_bad)
+        report = pandas_table.robust_insert({"Bad": 1})
+        assert mock.call_count == 1
+    assert "id" not in report
+    assert report.failed_fields == ["Bad"]
+    assert report.failures[0].error.endswith("INVALID_VALUE_FOR_COLUMN'}]")
+
+
+def test_upload_df_to_airtable_robust_with_plain_airtable(table):
+    from airtable.airframe import upload_df_to_airtable
+
+    df = pd.DataFrame({"Num": [1, 2], "Bad": [None, "x"]})
+    with Mocker() as mock:
+        mock.get(table.url_table, json={"records": []})
+        mock.post(table.url_table, json=reject_bad)
+        mock.patch(table.record_url("rec00000000000002"), json=reject_bad)
+        outcome = upload_df_to_airtable(
+            table, df, primary_key="Num", try_one_field_at_a_time=True
+        )
+    assert list(outcome["action"]) == ["insert", "insert"]
+    assert list(outcome["record_id"]) == ["rec00000000000001", "rec00000000000002"]
+    assert outcome["error"][1] == "failed fields: Bad"
+
+
+def test_update_one_field_at_a_time_reports_failures(pandas_table):
+    record_id = "rec00000000000001"
+    with Mocker() as mock:
+        mock.patch(pandas_table.record_url(record_id), json=reject_bad)
+        report = pandas_table.update_one_field_at_a_time(
+            record_id, {"A": 1, "Bad": "x"}
+        )
+        assert mock.call_count == 2
+    assert report["fields"] == {"A": 1}
+    assert report.failed_fields == ["Bad"]
+
+
+def test_buffered_writes_are_batched_and_merged(pandas_table):
+    with Mocker() as mock:
+        mock.post(pandas_table.url_table, json=echo_batch)
+        mock.patch(pandas_table.url_table, json=echo_batch)
+        with pandas_table.buffered(max_delay=60) as buffer:
+            inserts = [pandas_table.insert({"Num": i}) for i in range(12)]
+            first = pandas_table.update("rec1", {"Num": 1, "A": "a"})
+            second = pandas_table.update("rec1", {"A": "b"})
+            other = pandas_table.update("rec2", {"Num": 2})
+            assert inserts[0].result(timeout=5)["id"] == "rec{:014d}".format(0)
+            assert len(buffer) == 4
+        assert not pandas_table._write_buffer
+        assert [r.method for r in mock.request_history] == ["POST", "POST", "PATCH"]
+        patched = mock.request_history[-1].json()["records"]
+    assert patched == [
+        {"id": "rec1", "fields": {"Num": 1, "A": "b"}},
+        {"id": "rec2", "fields": {"Num": 2}},
+    ]
+    assert [f.result()["fields"]["Num"] for f in inserts] == list(range(12))
+    assert first.result() == second.result() == patched[0]
+    assert other.result()["id"] == "rec2"
+
+
+def test_buffered_flushes_after_max_delay(pandas_table):
+    with Mocker() as mock:
+        mock.post(pandas_table.url_table, json=echo_batch)
+        with pandas_table.buffered(max_delay=0.05):
+            future = pandas_table.insert({"Num": 1})
+            assert future.result(timeout=5)["fields"] == {"Num": 1}
+            assert mock.call_count == 1
+
+
+def test_buffered_rejected_record_fails_its_future(pandas_table):
+    with Mocker() as mock:
+        mock.post(pandas_table.url_table, json=reject_bad)
+        with pandas_table.buffered(max_delay=60):
+            good = pandas_table.insert({"Num": 1})
+            bad = pandas_table.insert({"Num": 2, "Bad": "x"})
+    assert good.result()["fields"] == {"Num": 1}
+    with pytest.raises(HTTPError):
+        bad.result()
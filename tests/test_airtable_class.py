@@ -270,6 +270,61 @@ def test_batch_delete_single_record(table, mock_response_single):
     test_batch_delete(table, [mock_response_single])
 
 
+def test_get_many(table, mock_records):
+    ids = [r["id"] for r in mock_records]
+    requested = [ids[2], "recMissing1234567", ids[0]]
+    with Mocker() as mock:
+        mock.get(
+            table.url_table,
+            status_code=200,
+            json={"records": [mock_records[0], mock_records[2]]},
+        )
+        records, missing = table.get_many(requested, return_missing=True)
+        formula = mock.last_request.qs["filterbyformula"][0]
+        assert mock.call_count == 1
+    assert [r["id"] for r in records] == [ids[2], ids[0]]
+    assert missing == ["recMissing1234567"]
+    assert formula.startswith("or(record_id()=")
+
+
+def test_chunk_formulas_respects_url_length(table):
+    formulas = ["RECORD_ID()='rec{:014d}'".format(i) for i in range(2000)]
+    chunks = list(table._chunk_formulas(formulas, fields=["Name"]))
+    assert len(chunks) > 1
+    assert sum(chunk.count("RECORD_ID()") for chunk in chunks) == 2000
+    for chunk in chunks:
+        params = table._process_params({"formula": chunk, "fields": ["Name"]})
+        url = table.url_table + "?" + urlencode(params, doseq=True)
+        assert len(url) < table.MAX_URL_LENGTH
+
+
+def test_search_many(table, mock_records):
+    with Mocker() as mock:
+        mock.get(table.url_table, status_code=200, json={"records": mock_records[:2]})
+        resp = table.search_many("Value", ["def", "abc", "nothing"], fields="Other")
+        qs = mock.last_request.qs
+        assert mock.call_count == 1
+    assert list(resp) == ["def", "abc", "nothing"]
+    assert resp["abc"] == [mock_records[0]]
+    assert resp["def"] == [mock_records[1]]
+    assert resp["nothing"] == []
+    assert qs["fields[]"] == ["other", "value"]
+    assert qs["filterbyformula"] == ["or({value}='def',{value}='abc',{value}='nothing')"]
+
+
+def test_search_many_numbers_and_lists(table):
+    records = [
+        {"id": "rec1", "fields": {"Num": 1, "Tags": ["a", "b"]}},
+        {"id": "rec2", "fields": {"Num": 2, "Tags": ["b"]}},
+    ]
+    with Mocker() as mock:
+        mock.get(table.url_table, status_code=200, json={"records": records})
+        by_num = table.search_many("Num", [2, 1])
+        by_tag = table.search_many("Tags", ["b"])
+    assert by_num == {2: [records[1]], 1: [records[0]]}
+    assert by_tag == {"b": records}
+
+
 # Helpers
 
 
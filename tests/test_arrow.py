@@ -0,0 +1,83 @@
+import pytest
+from requests_mock import Mocker
+
+pa = pytest.importorskip("pyarrow")
+pytest.importorskip("pandas")
+pytest.importorskip("boto3")
+
+from airtable.airframe import PandasAirtable  # noqa: E402
+from airtable.arrow import records_to_arrow, records_to_record_batch  # noqa: E402
+
+PAGE_1 = [
+    {
+        "id": "rec1",
+        "fields": {
+            "Name": "a",
+            "Tags": ["x", "y"],
+            "Files": [{"id": "att1", "url": "http://f", "size": 10}],
+        },
+    },
+    {"id": "rec2", "fields": {"Name": "b", "Count": 1}},
+]
+PAGE_2 = [{"id": "rec3", "fields": {"Count": 2.5, "Mixed": "x"}}]
+
+
+def test_record_batch_types():
+    batch = records_to_record_batch(PAGE_1)
+    assert batch.schema.names == ["record_id", "Name", "Tags", "Files", "Count"]
+    assert batch.schema.field("Tags").type == pa.list_(pa.string())
+    files = batch.schema.field("Files").type
+    assert pa.types.is_list(files) and pa.types.is_struct(files.value_type)
+    assert batch.column(4).to_pylist() == [None, 1]
+
+
+def test_mixed_values_are_json_encoded():
+    batch = records_to_record_batch(
+        [{"id": "rec1", "fields": {"M": "x"}}, {"id": "rec2", "fields": {"M": 1}}]
+    )
+    assert batch.column(1).to_pylist() == ["x", "1"]
+
+
+def test_records_to_arrow_promotes_schemas():
+    table = records_to_arrow([PAGE_1, PAGE_2])
+    assert table.num_rows == 3
+    assert table.column("record_id").to_pylist() == ["rec1", "rec2", "rec3"]
+    assert table.column("Count").type == pa.float64()
+    assert table.column("Name").to_pylist() == ["a", "b", None]
+
+
+def test_records_to_arrow_json_encodes_conflicts_across_pages():
+    pages = [
+        [{"id": "rec1", "fields": {"A": 1, "L": ["x"], "N": 1}}],
+        [{"id": "rec2", "fields": {"A": "x", "L": [{"url": "u"}], "N": 2.5}}],
+    ]
+    table = records_to_arrow(pages)
+    assert table.schema.field("A").type == pa.string()
+    assert table.schema.field("N").type == pa.float64()
+    assert table.column("A").to_pylist() == ["1", "x"]
+    assert table.column("L").to_pylist() == ['["x"]', '[{"url": "u"}]']
+
+
+def test_records_to_arrow_with_schema():
+    schema = pa.schema([("record_id", pa.string()), ("Count", pa.float64())])
+    table = records_to_arrow([PAGE_1, PAGE_2], schema=schema)
+    assert table.schema == schema
+    assert table.column("Count").to_pylist() == [None, 1.0, 2.5]
+    assert records_to_arrow([], schema=schema).schema == schema
+
+
+def test_to_arrow(make_table):
+    table = make_table(PandasAirtable)
+    with Mocker() as mock:
+        mock.get(
+            table.url_table,
+            [
+                {"json": {"records": PAGE_1, "offset": "itr1"}},
+                {"json": {"records": PAGE_2}},
+            ]
+            * 2,
+        )
+        assert table.to_arrow(view="Grid").num_rows == 3
+        assert mock.request_history[0].qs["view"] == ["grid"]
+        batches = list(table.to_arrow_iter())
+    assert [batch.num_rows for batch in batches] == [2, 1]
@@ -0,0 +1,95 @@
+import threading
+import time
+
+import pytest
+from requests import HTTPError
+from requests_mock import Mocker
+
+from airtable import BatchError
+
+
+def echo_records(request, context):
+    """Returns the posted records with ids derived from their values"""
+    time.sleep(0.01)  # let chunks overlap so completion order varies
+    body = request.json()
+    if any(r["fields"].get("Value") == "bad" for r in body["records"]):
+        context.status_code = 422
+        return {"error": {"type": "INVALID_VALUE_FOR_COLUMN"}}
+    return {
+        "records": [
+            {
+                "id": r.get("id", "rec{}".format(r["fields"]["Value"])),
+                "fields": r["fields"],
+            }
+            for r in body["records"]
+        ]
+    }
+
+
+def test_batch_insert_concurrent_keeps_order(fast_table):
+    records = [{"Value": i} for i in range(45)]
+    threads = set()
+
+    def callback(request, context):
+        threads.add(threading.get_ident())
+        return echo_records(request, context)
+
+    with Mocker() as mock:
+        mock.post(fast_table.url_table, json=callback)
+        resp = fast_table.batch_insert(records, max_workers=4)
+        assert mock.call_count == 5
+    assert [r["fields"] for r in resp] == records
+    assert len(threads) > 1
+
+
+def test_batch_insert_concurrent_reports_failed_chunks(fast_table):
+    records = [{"Value": i} for i in range(30)]
+    records[15] = {"Value": "bad"}
+    with Mocker() as mock:
+        mock.post(fast_table.url_table, json=echo_records)
+        with pytest.raises(BatchError) as excinfo:
+            fast_table.batch_insert(records, max_workers=3)
+        assert mock.call_count == 3
+    error = excinfo.value
+    assert len(error.records) == 30
+    assert error.records[10:20] == [None] * 10
+    assert error.records[0]["id"] == "rec0"
+    assert error.records[29]["id"] == "rec29"
+    (failure,) = error.failures
+    assert failure.start == 10
+    assert failure.items == records[10:20]
+    assert isinstance(failure.exception, HTTPError)
+
+
+def test_batch_insert_sequential_raises_first_error(fast_table):
+    records = [{"Value": "bad"}] + [{"Value": i} for i in range(15)]
+    with Mocker() as mock:
+        mock.post(fast_table.url_table, json=echo_records)
+        with pytest.raises(HTTPError):
+            fast_table.batch_insert(records)
+        assert mock.call_count == 1
+
+
+def test_batch_update_concurrent(fast_table):
+    records = [{"id": "rec{}".format(i), "fields": {"Value": i}} for i in range(25)]
+    with Mocker() as mock:
+        mock.patch(fast_table.url_table, json=echo_records)
+        resp = fast_table.batch_update(records, max_workers=3)
+    assert [r["id"] for r in resp] == [r["id"] for r in records]
+
+
+def test_batch_delete_concurrent(fast_table):
+    ids = ["rec{:014d}".format(i) for i in range(21)]
+
+    def callback(request, context):
+        if "records" in request.qs:
+            return {
+                "records": [{"deleted": True, "id": i} for i in request.qs["records"]]
+            }
+        return {"deleted": True, "id": request.path.rsplit("/", 1)[-1]}
+
+    with Mocker() as mock:
+        mock.delete(fast_table.url_table, json=callback)
+        mock.delete(fast_table.record_url(ids[-1]), json=callback)
+        resp = fast_table.batch_delete(ids, max_workers=3)
+    assert [r["id"] for r in resp] == ids
@@ -0,0 +1,194 @@
+import pytest
+from requests_mock import Mocker
+
+from airtable.cache import CacheStats, ResponseCache
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def cached_table(make_table):
+    return make_table(cache=ResponseCache())
+
+
+def test_ttl(clock):
+    cache = ResponseCache(ttl=10, clock=clock)
+    cache.set("key", {"a": 1})
+    clock.now = 9.9
+    assert cache.get("key") == {"a": 1}
+    clock.now = 10
+    assert cache.get("key") is None
+    assert cache.stats == CacheStats(hits=1, misses=1, evictions=0, size=0)
+
+
+def test_lru_eviction():
+    cache = ResponseCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats.evictions == 1
+
+
+def test_values_are_copied():
+    cache = ResponseCache()
+    response = {"records": [{"id": "rec1"}]}
+    cache.set("key", response)
+    response["records"].clear()
+    cache.get("key")["records"].clear()
+    assert cache.get("key") == {"records": [{"id": "rec1"}]}
+
+
+def test_invalidate_prefix():
+    cache = ResponseCache()
+    cache.set(cache.key("https://x/app/Table"), 1)
+    cache.set(cache.key("https://x/app/Table/rec1"), 2)
+    cache.set(cache.key("https://x/app/Table2"), 3)
+    version = cache.version
+    cache.invalidate("https://x/app/Table")
+    assert len(cache) == 1
+    cache.set(cache.key("https://x/app/Table"), 4, version=version)
+    assert cache.get(cache.key("https://x/app/Table")) is None
+
+
+def test_key_uses_params_and_api_key():
+    key = ResponseCache.key
+    assert key("u", {"a": 1, "b": [1, 2]}) == key("u", {"b": [1, 2], "a": 1})
+    assert key("u", {"a": 1}) != key("u", {"a": 2})
+    assert key("u", {"a": 1}, "key1") != key("u", {"a": 1}, "key2")
+
+
+def test_reads_are_cached(cached_table, mock_response_single, mock_records):
+    record_id = mock_response_single["id"]
+    with Mocker() as mock:
+        mock.get(cached_table.url_table, json={"records": mock_records})
+        mock.get(cached_table.record_url(record_id), json=mock_response_single)
+        assert cached_table.get_all(view="View") == mock_records
+        assert cached_table.get_all(view="View") == mock_records
+        assert mock.call_count == 1
+        cached_table.get_all(view="Other")
+        assert mock.call_count == 2
+        cached_table.get(record_id)
+        cached_table.get(record_id)
+        assert mock.call_count == 3
+    assert cached_table.cache.stats == CacheStats(hits=2, misses=3, evictions=0, size=3)
+
+
+def test_writes_invalidate_table(cached_table, mock_response_single, mock_records):
+    with Mocker() as mock:
+        mock.get(cached_table.url_table, json={"records": mock_records})
+        mock.post(cached_table.url_table, json=mock_response_single)
+        cached_table.get_all()
+        cached_table.insert({"Value": "abc"})
+        cached_table.get_all()
+        assert [r.method for r in mock.request_history] == ["GET", "POST", "GET"]
+
+
+def test_no_cache_by_default(table, mock_records):
+    assert table.cache is None
+    with Mocker() as mock:
+        mock.get(table.url_table, json={"records": mock_records})
+        table.get_all()
+        table.get_all()
+        assert mock.call_count == 2
+
+
+def test_single_flight_merges_concurrent_gets(fast_table, mock_records):
+    import threading
+    import time
+
+    from airtable.cache import SingleFlight
+
+    table = fast_table
+    table.single_flight = flight = SingleFlight()
+    threads = 8
+
+    def respond(request, context):
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            calls = list(flight._calls.values())
+            if calls and calls[0].waiters == threads - 1:
+                break
+            time.sleep(0.001)
+        return {"records": mock_records}
+
+    results = []
+    with Mocker() as mock:
+        mock.get(table.url_table, json=respond)
+        workers = [
+            threading.Thread(target=lambda: results.append(table.get_all()))
+            for _ in range(threads)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        assert mock.call_count == 1
+    assert results == [mock_records] * threads
+    assert len({id(result) for result in results}) == threads
+    assert len(flight) == 0
+
+
+def test_single_flight_propagates_exceptions():
+    from airtable.cache import SingleFlight
+
+    flight = SingleFlight()
+    with pytest.raises(ValueError):
+        flight.do("key", lambda: int("x"))
+    assert flight.do("key", lambda: 1) == 1
+
+
+def test_single_flight_reads_own_writes(table):
+    import threading
+
+    from airtable.cache import SingleFlight
+
+    table.single_flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    sent = []
+
+    def send_request(method, url, params, json_data):
+        # requests_mock serializes requests, so fake the transport instead
+        sent.append(method)
+        if len(sent) == 1:
+            started.set()
+            release.wait(5)
+            return {"N": 1}
+        return {"N": 2}
+
+    table._send_request = send_request
+    results = []
+    before = threading.Thread(
+        target=lambda: results.append(table._get(table.url_table))
+    )
+    before.start()
+    started.wait(5)
+    table._patch(table.url_table, {"N": 2})
+    assert table._get(table.url_table) == {"N": 2}
+    release.set()
+    before.join()
+    assert sent == ["get", "patch", "get"]
+    assert results == [{"N": 1}]
+
+
+def test_single_flight_generation():
+    from airtable.cache import SingleFlight
+
+    flight = SingleFlight()
+    assert flight.generation("https://x/app/Table") == 0
+    flight.bump("https://x/app/Table")
+    assert flight.generation("https://x/app/Table") == 1
+    assert flight.generation("https://x/app/Table2") == 0
@@ -101,3 +101,21 @@ def test_formula_from_name_and_value():
 def test_get_invalid_param_keyword():
     with pytest.raises(ValueError):
         AirtableParams._get("unknown parameter")
+
+
+def test_formula_from_record_id():
+    formula = AirtableParams.FormulaParam.from_record_id("recwPQIfs4wKPyc9D")
+    assert formula == "RECORD_ID()='recwPQIfs4wKPyc9D'"
+
+
+def test_formula_any_of():
+    formula = AirtableParams.FormulaParam.any_of(["{A}=1", "{B}='x'"])
+    assert formula == "OR({A}=1,{B}='x')"
+
+
+def test_formula_modified_since():
+    formula = AirtableParams.FormulaParam.modified_since("2020-01-01T00:00:00.000Z")
+    assert formula == (
+        "OR(IS_AFTER(LAST_MODIFIED_TIME(),DATETIME_PARSE('2020-01-01T00:00:00.000Z')),"
+        "IS_AFTER(CREATED_TIME(),DATETIME_PARSE('2020-01-01T00:00:00.000Z')))"
+    )
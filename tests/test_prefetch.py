@@ -0,0 +1,87 @@
+import threading
+import time
+
+import pytest
+from requests import HTTPError
+from requests_mock import Mocker
+
+from airtable.airtable import _prefetch
+
+
+def mock_pages(mock, table, pages):
+    for n, page in enumerate(pages):
+        url = table.url_table
+        if n:
+            url += "?offset=off{}".format(n)
+        body = {"records": page}
+        if n < len(pages) - 1:
+            body["offset"] = "off{}".format(n + 1)
+        mock.get(url, json=body, complete_qs=True)
+
+
+def test_prefetch_yields_all_items():
+    assert list(_prefetch(iter(range(10)), 3)) == list(range(10))
+
+
+def test_prefetch_runs_ahead():
+    produced = []
+
+    def items():
+        for i in range(5):
+            produced.append(i)
+            yield i
+
+    pages = _prefetch(items(), 2)
+    assert next(pages) == 0
+    time.sleep(0.1)
+    assert len(produced) >= 3
+    pages.close()
+
+
+def test_prefetch_raises_in_consumer():
+    def items():
+        yield 1
+        raise ValueError("boom")
+
+    pages = _prefetch(items(), 2)
+    assert next(pages) == 1
+    with pytest.raises(ValueError):
+        next(pages)
+
+
+def test_prefetch_stops_producer_on_close():
+    closed = threading.Event()
+
+    def items():
+        try:
+            for i in range(1000):
+                yield i
+        finally:
+            closed.set()
+
+    pages = _prefetch(items(), 1)
+    next(pages)
+    pages.close()
+    assert closed.wait(2)
+
+
+def test_get_iter_prefetch(fast_table, mock_records):
+    pages = [[r] for r in mock_records]
+    with Mocker() as mock:
+        mock_pages(mock, fast_table, pages)
+        assert list(fast_table.get_iter(prefetch=2)) == pages
+        assert fast_table.get_all(prefetch=1) == mock_records
+
+
+def test_get_iter_prefetch_error_keeps_offset(fast_table, mock_records):
+    with Mocker() as mock:
+        mock_pages(mock, fast_table, [[r] for r in mock_records])
+        mock.get(
+            fast_table.url_table + "?offset=off2", status_code=404, complete_qs=True
+        )
+        pages = fast_table.get_iter(prefetch=2)
+        next(pages)
+        next(pages)
+        with pytest.raises(HTTPError) as excinfo:
+            next(pages)
+    assert excinfo.value.offset == "off2"
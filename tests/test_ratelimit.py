@@ -0,0 +1,107 @@
+import pytest
+from requests_mock import Mocker
+
+from airtable import Airtable
+from airtable.ratelimit import TokenBucket, get_rate_limiter
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def test_first_token_is_free(clock):
+    bucket = TokenBucket(5, clock=clock, sleep=clock.sleep)
+    assert bucket.acquire() == 0.0
+    assert clock.sleeps == []
+
+
+def test_waits_for_refill(clock):
+    bucket = TokenBucket(5, clock=clock, sleep=clock.sleep)
+    bucket.acquire()
+    assert bucket.acquire() == pytest.approx(0.2)
+    assert bucket.acquire() == pytest.approx(0.2)
+
+
+def test_elapsed_time_counts_towards_budget(clock):
+    bucket = TokenBucket(5, clock=clock, sleep=clock.sleep)
+    bucket.acquire()
+    clock.now += 0.15  # time spent on the request itself
+    assert bucket.acquire() == pytest.approx(0.05)
+    clock.now += 1.0
+    assert bucket.acquire() == 0.0
+
+
+def test_capacity_allows_burst(clock):
+    bucket = TokenBucket(5, capacity=3, clock=clock, sleep=clock.sleep)
+    clock.now += 10
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.reserve() == pytest.approx(0.2)
+
+
+def test_reservations_queue_up(clock):
+    bucket = TokenBucket(5, clock=clock, sleep=clock.sleep)
+    waits = [bucket.reserve() for _ in range(4)]
+    assert waits == pytest.approx([0.0, 0.2, 0.4, 0.6])
+
+
+def test_decrease_and_increase(clock):
+    bucket = TokenBucket(
+        4, min_rate=1, increase_step=0.5, clock=clock, sleep=clock.sleep
+    )
+    bucket.decrease()
+    assert bucket.rate == 2
+    bucket.decrease()
+    bucket.decrease()
+    assert bucket.rate == 1
+    for _ in range(10):
+        bucket.increase()
+    assert bucket.rate == 4
+
+
+def test_invalid_rate():
+    with pytest.raises(ValueError):
+        TokenBucket(0)
+
+
+def test_limiter_shared_per_base():
+    table_a = Airtable("appSharedLimiter", "A", api_key="x")
+    table_b = Airtable("appSharedLimiter", "B", api_key="x")
+    table_c = Airtable("appOtherLimiter", "A", api_key="x")
+    assert table_a.rate_limiter is table_b.rate_limiter
+    assert table_a.rate_limiter is get_rate_limiter("appSharedLimiter")
+    assert table_a.rate_limiter is not table_c.rate_limiter
+
+
+def test_request_consults_limiter(constants, mock_response_single):
+    calls = []
+
+    class Limiter(TokenBucket):
+        def acquire(self):
+            calls.append(1)
+
+    table = Airtable(
+        constants["BASE_KEY"],
+        constants["TABLE_NAME"],
+        api_key=constants["API_KEY"],
+        rate_limiter=Limiter(5),
+    )
+    _id = mock_response_single["id"]
+    with Mocker() as mock:
+        mock.get(table.record_url(_id), status_code=200, json=mock_response_single)
+        table.get(_id)
+        table.get(_id)
+    assert len(calls) == 2
@@ -0,0 +1,172 @@
+import email.utils
+import time
+
+import pytest
+import requests
+from requests import HTTPError
+from requests_mock import Mocker
+
+from airtable.retry import RetryPolicy
+
+
+class Response(object):
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+@pytest.fixture
+def sleeps():
+    return []
+
+
+@pytest.fixture
+def retry_table(make_table, sleeps):
+    return make_table(retry=RetryPolicy(max_retries=3, sleep=sleeps.append))
+
+
+@pytest.mark.parametrize(
+    "method,status_code,expected",
+    [
+        ("GET", 429, True),
+        ("POST", 429, True),
+        ("GET", 503, True),
+        ("PATCH", 500, True),
+        ("POST", 503, False),
+        ("GET", 404, False),
+        ("GET", 422, False),
+    ],
+)
+def test_is_retryable(method, status_code, expected):
+    policy = RetryPolicy()
+    assert policy.is_retryable(method, 0, Response(status_code)) is expected
+
+
+def test_is_retryable_connection_error():
+    policy = RetryPolicy()
+    assert policy.is_retryable("GET", 0)
+    assert not policy.is_retryable("POST", 0)
+
+
+def test_max_retries():
+    policy = RetryPolicy(max_retries=2)
+    assert policy.is_retryable("GET", 1, Response(429))
+    assert not policy.is_retryable("GET", 2, Response(429))
+
+
+def test_backoff_is_bounded():
+    policy = RetryPolicy(backoff_factor=1, max_backoff=5)
+    for attempt in range(10):
+        assert 0 <= policy.get_backoff(attempt) <= min(5, 2**attempt)
+
+
+def test_retry_after_seconds():
+    policy = RetryPolicy()
+    assert policy.get_backoff(0, Response(429, {"Retry-After": "7"})) == 7
+
+
+def test_retry_after_date():
+    date = email.utils.formatdate(time.time() + 30, usegmt=True)
+    wait = RetryPolicy.parse_retry_after(date)
+    assert 25 < wait <= 30
+
+
+def test_retry_after_invalid():
+    assert RetryPolicy.parse_retry_after(None) is None
+    assert RetryPolicy.parse_retry_after("soon") is None
+
+
+def test_request_retries_then_succeeds(retry_table, mock_response_single, sleeps):
+    _id = mock_response_single["id"]
+    with Mocker() as mock:
+        mock.get(
+            retry_table.record_url(_id),
+            [
+                {"status_code": 429, "headers": {"Retry-After": "2"}},
+                {"status_code": 503},
+                {"status_code": 200, "json": mock_response_single},
+            ],
+        )
+        resp = retry_table.get(_id)
+    assert resp == mock_response_single
+    assert len(sleeps) == 2
+    assert sleeps[0] == 2
+
+
+def test_request_retries_exhausted(retry_table, mock_response_single, sleeps):
+    _id = mock_response_single["id"]
+    with Mocker() as mock:
+        mock.get(retry_table.record_url(_id), status_code=503)
+        with pytest.raises(HTTPError):
+            retry_table.get(_id)
+        assert mock.call_count == 4
+
+
+def test_post_not_retried_on_server_error(retry_table, mock_response_single):
+    with Mocker() as mock:
+        mock.post(retry_table.url_table, status_code=500)
+        with pytest.raises(HTTPError):
+            retry_table.insert(mock_response_single["fields"])
+        assert mock.call_count == 1
+
+
+def test_connection_error_retried(retry_table, mock_response_single):
+    _id = mock_response_single["id"]
+    with Mocker() as mock:
+        mock.get(
+            retry_table.record_url(_id),
+            [
+                {"exc": requests.exceptions.ConnectionError},
+                {"status_code": 200, "json": mock_response_single},
+            ],
+        )
+        assert retry_table.get(_id) == mock_response_single
+
+
+def test_rate_decreases_after_429(retry_table, mock_response_single):
+    _id = mock_response_single["id"]
+    with Mocker() as mock:
+        mock.get(
+            retry_table.record_url(_id),
+            [{"status_code": 429}, {"status_code": 200, "json": mock_response_single}],
+        )
+        retry_table.get(_id)
+    limiter = retry_table.rate_limiter
+    assert limiter.rate < limiter.max_rate
+
+
+def test_get_iter_retries_page_from_offset(retry_table, mock_response_list):
+    with Mocker() as mock:
+        mock.get(
+            retry_table.url_table,
+            json=mock_response_list[0],
+            complete_qs=True,
+        )
+        mock.get(
+            retry_table.url_table + "?offset=recuOeLpF6TQpArJi",
+            [{"status_code": 502}, {"status_code": 200, "json": mock_response_list[1]}],
+            complete_qs=True,
+        )
+        pages = list(retry_table.get_iter())
+        assert mock.call_count == 3
+    assert pages == [r["records"] for r in mock_response_list]
+
+
+def test_get_all_failure_can_resume(retry_table, mock_response_list):
+    with Mocker() as mock:
+        mock.get(
+            retry_table.url_table,
+            json=mock_response_list[0],
+            complete_qs=True,
+        )
+        offset_url = retry_table.url_table + "?offset=recuOeLpF6TQpArJi"
+        mock.get(offset_url, status_code=503, complete_qs=True)
+        with pytest.raises(HTTPError) as excinfo:
+            retry_table.get_all()
+        mock.get(
+            offset_url, status_code=200, json=mock_response_list[1], complete_qs=True
+        )
+        rest = retry_table.get_all(offset=excinfo.value.offset)
+    assert excinfo.value.offset == "recuOeLpF6TQpArJi"
+    assert excinfo.value.records == mock_response_list[0]["records"]
+    assert rest == mock_response_list[1]["records"]
@@ -0,0 +1,163 @@
+import datetime
+import posixpath
+
+import pytest
+from requests_mock import Mocker
+
+from airtable.schema import (
+    SchemaError,
+    TableSchema,
+    WriteFailure,
+    coerce_value,
+    infer_field_type,
+)
+
+
+@pytest.fixture
+def meta_table():
+    return {
+        "id": "tblXXXXXXXXXXXXXX",
+        "name": "Table Name",
+        "primaryFieldId": "fld2",
+        "fields": [
+            {"id": "fld1", "name": "Quantity", "type": "number"},
+            {"id": "fld2", "name": "Name", "type": "singleLineText"},
+            {"id": "fld3", "name": "Total", "type": "formula"},
+            {"id": "fld4", "name": "Done", "type": "checkbox"},
+        ],
+    }
+
+
+def test_from_meta(meta_table):
+    schema = TableSchema.from_meta(meta_table)
+    assert schema.primary_key == "Name"
+    assert list(schema.fields) == ["Quantity", "Name", "Total", "Done"]
+    assert schema.read_only == {"Total"}
+    assert schema.complete
+
+
+def test_coerce(meta_table):
+    schema = TableSchema.from_meta(meta_table)
+    fields, failures = schema.coerce(
+        {"Quantity": "1,200", "Name": 12.0, "Total": 3, "Done": "yes", "Other": 1}
+    )
+    assert fields == {"Quantity": 1200, "Name": "12", "Done": True}
+    assert failures == [
+        WriteFailure({"Total": 3}, "read-only field"),
+        WriteFailure({"Other": 1}, "unknown field"),
+    ]
+
+    fields, failures = schema.coerce({"Quantity": "many"})
+    assert fields == {}
+    assert failures[0].fields == {"Quantity": "many"}
+
+
+def test_from_records_is_incomplete(mock_records):
+    schema = TableSchema.from_records(mock_records)
+    assert schema.primary_key == "SameField"
+    assert schema.fields == {"SameField": "number", "Value": "singleLineText"}
+    fields, failures = schema.coerce({"Value": 1, "New": "x"})
+    assert fields == {"Value": "1", "New": "x"}
+    assert failures == []
+
+
+def test_save_load(tmp_path, meta_table):
+    path = str(tmp_path / "schemas" / "table.json")
+    TableSchema.from_meta(meta_table).save(path)
+    schema = TableSchema.load(path)
+    assert schema.primary_key == "Name"
+    assert list(schema.fields) == ["Quantity", "Name", "Total", "Done"]
+    assert schema.read_only == {"Total"}
+
+
+@pytest.mark.parametrize(
+    "value,field_type",
+    [
+        (True, "checkbox"),
+        (1.5, "number"),
+        ("2020-01-02", "date"),
+        ("2020-01-02T03:04:05.000Z", "dateTime"),
+        ("a\nb", "multilineText"),
+        (["recH73JJvr7vv1234"], "multipleRecordLinks"),
+        (["a", "b"], "multipleSelects"),
+        ([{"url": "https://x"}], "multipleAttachments"),
+        ({"a": 1}, None),
+    ],
+)
+def test_infer_field_type(value, field_type):
+    assert infer_field_type(value) == field_type
+
+
+def test_coerce_value():
+    assert coerce_value(float("nan"), "number") is None
+    assert coerce_value("a", "multipleSelects") == ["a"]
+    assert coerce_value(datetime.datetime(2020, 1, 2, 3), "date") == "2020-01-02"
+    assert (
+        coerce_value(datetime.datetime(2020, 1, 2, 3), "dateTime")
+        == "2020-01-02T03:00:00+00:00"
+    )
+    with pytest.raises(SchemaError):
+        coerce_value(True, "number")
+    with pytest.raises(SchemaError):
+        coerce_value("maybe", "checkbox")
+
+
+pytest.importorskip("pandas")
+pytest.importorskip("boto3")
+
+from airtable.airframe import PandasAirtable  # noqa: E402
+
+
+@pytest.fixture
+def schema_table(make_table, tmp_path):
+    return make_table(PandasAirtable, schema=str(tmp_path / "schema.json"))
+
+
+def meta_url(table):
+    return posixpath.join(table.API_URL, "meta/bases", table.base_key, "tables")
+
+
+def test_primary_key_from_meta(schema_table, meta_table, tmp_path):
+    with Mocker() as mock:
+        mock.get(meta_url(schema_table), json={"tables": [meta_table]})
+        assert schema_table.primary_key == "Name"
+        assert mock.call_count == 1
+    # reading the primary key does not turn on write checks
+    assert schema_table.table_schema is None
+    assert not (tmp_path / "schema.json").exists()
+
+
+def test_learn_schema_saves_and_checks_writes(schema_table, meta_table, tmp_path):
+    with Mocker() as mock:
+        mock.get(meta_url(schema_table), json={"tables": [meta_table]})
+        schema_table.learn_schema()
+    assert TableSchema.load(str(tmp_path / "schema.json")).primary_key == "Name"
+    assert schema_table.table_schema.read_only == {"Total"}
+
+
+def test_writes_unchecked_without_schema(schema_table, mock_records):
+    with Mocker() as mock:
+        mock.get(meta_url(schema_table), status_code=403)
+        mock.get(schema_table.url_table, json={"records": mock_records})
+        mock.post(schema_table.url_table, json={"records": []})
+        assert schema_table.primary_key == "SameField"
+        schema_table.batch_insert([{"SameField": "x", "Other": 1}])
+        sent = mock.last_request.json()["records"]
+    assert sent == [{"fields": {"SameField": "x", "Other": 1}}]
+
+
+def test_primary_key_from_sample(schema_table, mock_records):
+    with Mocker() as mock:
+        mock.get(meta_url(schema_table), status_code=403)
+        mock.get(schema_table.url_table, json={"records": mock_records})
+        assert schema_table.primary_key == "SameField"
+        assert mock.request_history[-1].qs["maxrecords"] == ["100"]
+
+
+def test_writes_are_coerced(schema_table, meta_table, capsys):
+    schema_table.table_schema = TableSchema.from_meta(meta_table)
+    with Mocker() as mock:
+        mock.post(schema_table.url_table, json={"records": []})
+        schema_table.batch_insert([{"Quantity": "3", "Total": 9}])
+        assert mock.last_request.json()["records"] == [{"fields": {"Quantity": 3}}]
+    assert "Total (read-only field)" in capsys.readouterr().out
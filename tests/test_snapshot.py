@@ -0,0 +1,84 @@
+import os
+
+import pytest
+from requests_mock import Mocker
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+pytest.importorskip("boto3")
+pytest.importorskip("pyarrow")
+
+from airtable.airframe import PandasAirtable  # noqa: E402
+from airtable.snapshot import SnapshotStore  # noqa: E402
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SnapshotStore(str(tmp_path))
+
+
+def test_key_depends_on_table_and_params():
+    key = SnapshotStore.key("app1", "Table")
+    assert key == SnapshotStore.key("app1", "Table", {})
+    assert key != SnapshotStore.key("app1", "Other")
+    assert key != SnapshotStore.key("app1", "Table", {"view": "Grid"})
+
+
+def test_round_trip(store):
+    df = pd.DataFrame(
+        {
+            "Name": ["a", None, "c"],
+            "Num": [1.5, np.nan, 3.0],
+            "Links": [["recA"], None, ["recB", "recC"]],
+            "Attachment": [{"url": "http://x"}, None, None],
+            "Mixed": ["x", 1, None],
+        },
+        index=pd.Index(["rec1", "rec2", "rec3"], name="record_id"),
+    )
+    store.save("key", df, {"watermark": "2020-01-01T00:00:00+00:00"})
+    loaded, metadata = store.load("key")
+    assert metadata == {"watermark": "2020-01-01T00:00:00+00:00"}
+    assert loaded.index.name == "record_id"
+    assert list(loaded.index) == ["rec1", "rec2", "rec3"]
+    assert loaded["Links"].tolist() == [["recA"], None, ["recB", "recC"]]
+    assert loaded["Attachment"].iloc[0] == {"url": "http://x"}
+    assert loaded["Mixed"].tolist() == ["x", 1, None]
+    assert loaded["Name"].tolist() == ["a", None, "c"]
+    assert np.isnan(loaded["Num"].iloc[1])
+    assert os.listdir(store.directory) == ["key.arrow"]
+
+
+def test_load_missing_or_unreadable(store):
+    assert store.load("missing") is None
+    with open(store.path("broken"), "wb") as f:
+        f.write(b"not arrow")
+    assert store.load("broken") is None
+    store.delete("broken")
+    store.delete("broken")
+    assert os.listdir(store.directory) == []
+
+
+def test_warm_start_from_snapshot(make_table, tmp_path, mock_records):
+    table = make_table(PandasAirtable, snapshot_dir=str(tmp_path))
+    with Mocker() as mock:
+        mock.get(table.url_table, json={"records": mock_records})
+        assert len(table.df) == 3
+        assert mock.call_count == 1
+
+    table = make_table(PandasAirtable, snapshot_dir=str(tmp_path))
+    changed = {"id": mock_records[0]["id"], "fields": {"Value": "ABC"}}
+    with Mocker() as mock:
+        mock.get(
+            table.url_table,
+            [
+                {"json": {"records": [changed]}},
+                {"json": {"records": [changed] + mock_records[1:]}},
+            ],
+        )
+        df = table.to_df()
+        urls = [r.url for r in mock.request_history]
+    assert len(urls) == 2  # changes since the snapshot, then the deletion scan
+    assert "filterByFormula" in urls[0]
+    assert list(df["Value"]) == ["ABC", "def", "xyz"]
+    assert df.index.name == "record_id"
+    assert table._watermark is not None